@@ -2,28 +2,62 @@
 Complexity:
     Time: BEST CASE: O(n+1) - WORST CASE: O(n^2)
         (Average time is usually 0.17ms for input size of 10,000 csv params and output of 6 params with precision of 100%)
-        (Automatically 1 second is added to the time to make sure the sync is on (using `time.sleep`))
 
     Space: O(n)
         (Average RAM intake is around 0.32MB for input size of 10,000 (Excluding the .json and csv file sizes)
 """
 
 import csv
+import io
 import json
 import os.path
 import random
 import re
+import signal
 import sqlite3
+import struct
+import sys
+import threading
+import argparse
+import bisect
+import bz2
+import cProfile
+import gzip
 import hashlib
+import hmac
+import lzma
+import mmap
 import os
+import pstats
+import queue
+import socket
 import time
+import tracemalloc
+import zipfile
+from array import array
+from collections import Counter, OrderedDict
+from itertools import accumulate
 import colorlog
-import pandas as pd
+from openpyxl import Workbook
 import datetime as dt
 from datetime import datetime
 
 
 class SQL:
+    # The PBKDF2 iteration count used for new password hashes
+    HASH_ITERATIONS = 100_000
+    # The plaintext passwords of older databases hashed per transaction, about a second of PBKDF2
+    MIGRATION_BATCH = 20
+    # The environment variable that may hold the password fingerprint key, instead of the key file
+    PEPPER_ENV = "EXAM_PEPPER"
+    # The table of the users, in the database itself or in every shard
+    USERS_SCHEMA = """CREATE TABLE Users (
+                            id INTEGER PRIMARY KEY,
+                            username TEXT NOT NULL UNIQUE,
+                            password TEXT NOT NULL,
+                            titles_to_exclude TEXT,
+                            password_fingerprint TEXT);"""
+
     def __init__(self, database_name="Users.db"):
         """
         Initializes the SQL class.
@@ -33,24 +67,43 @@ class SQL:
         """
         # Set the database name
         self.db_name = database_name
-        if not os.path.exists(self.db_name):
-            self.create_db()
+        # The server-wide key of the password fingerprints, loaded by upgrade_db
+        self.__pepper = None
+        # The amount of files the users are split across, loaded by upgrade_db
+        self.shards = 1
+        # The in-memory copy exam generation reads users from, see `REPLICA`
+        self.replica = None
         # Initialize the connection and cursor to None
         self.conn = None
         self.cursor = None
+        self.__connected_path = None
+        if not os.path.exists(self.db_name):
+            self.create_db()
+        else:
+            self.upgrade_db()
 
-    def __connect(self):
+    def __connect(self, username: str = None, path: str = None):
         """
-        Establishes a connection to the SQLite database.
+        Establishes a connection to the SQLite database holding a user.
 
-        If a connection does not already exist, this method creates a new connection
+        If a connection to that shard does not already exist, this method creates a new connection
         and sets the cursor object.
+
+        Args:
+            username (str, optional): The user to route to, selects the shard holding them.
+            path (str, optional): The shard to connect to, instead of routing a username.
         """
+        if path is None:
+            path = self.__shard_path(username)
+        # Drop a connection left open to another shard
+        if self.conn is not None and self.__connected_path != path:
+            self.__disconnect()
         # Check if a connection has already been established
         if self.conn is None:
             colorlog.debug("Connecting to SQLite database...")
             # Create a new connection to the SQLite database
-            self.conn = sqlite3.connect(self.db_name)
+            self.conn = sqlite3.connect(path)
+            self.__connected_path = path
             # Set the cursor object for the connection
             self.cursor = self.conn.cursor()
 
@@ -69,6 +122,29 @@ class SQL:
             self.conn = None
             # Reset the cursor object to None
             self.cursor = None
+            self.__connected_path = None
+
+    def __shard_path(self, username: str = None) -> str:
+        """
+        Returns the path of the shard holding a user, the first shard without a username.
+        """
+        return self.shard_paths()[self.shard_of(username, self.shards) if username is not None else 0]
+
+    def __read_replica(self, username: str, query: str) -> tuple | None:
+        """
+        Reads the row of a user from the in-memory copy, when there is one and it is recent enough.
+
+        Args:
+            username (str): The username, the only parameter of the query.
+            query (str): The query.
+
+        Returns:
+            tuple: The first row of the query, None if there is none or the file must be read instead.
+        """
+        if self.replica is None:
+            return None
+        rows = self.replica.read(self.__shard_path(username), query, (username,))
+        return rows[0] if rows else None
 
     def __add_exclusion_db(self, name: str, exclusion_titles: list[str]) -> bool | None:
         """
@@ -82,7 +158,7 @@ class SQL:
             str: A success or error message.
         """
         try:
-            self.__connect()
+            self.__connect(name)
             try:
                 # Execute a SELECT statement to get the existing titles to exclude for the user
                 self.cursor.execute(
@@ -117,6 +193,8 @@ class SQL:
                         (updated_titles, name),
                     )
                     self.conn.commit()
+                    if self.replica is not None:
+                        self.replica.changed()
                     log.info(f"Successfully updated titles for user {name}.")
                     return True
                 else:
@@ -147,50 +225,376 @@ class SQL:
         cursor.execute("""DROP TABLE IF EXISTS Users;""")
 
         # Create a new 'Users' table with the required columns
+        cursor.execute(self.USERS_SCHEMA)
+
+        # Commit the changes to the database
+        conn.commit()
+        # Close the connection to the database
+        conn.close()
+
+        # Create the tables that were added after the initial schema
+        self.upgrade_db()
+
+    def upgrade_db(self):
+        """
+        Brings an existing database up to the current schema.
+
+        Every statement is idempotent, so this is safe to run on each start-up, and only writes when
+        something is missing. The 'Settings' table of the database holds the amount of shards,
+        the fingerprint key is kept outside of it, see `__load_pepper`,
+        and the user tables are upgraded in every shard, see `__upgrade_shard`.
+        """
+        colorlog.debug("Upgrading database schema...")
+        conn = sqlite3.connect(self.db_name)
+        cursor = conn.cursor()
+
+        # Create the settings table and the shard count on first use
+        cursor.execute(
+            """CREATE TABLE IF NOT EXISTS Settings (
+                            key TEXT PRIMARY KEY,
+                            value BLOB NOT NULL);"""
+        )
+        cursor.execute("""SELECT value FROM Settings WHERE key='shards'""")
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute("""INSERT OR IGNORE INTO Settings (key, value) VALUES ('shards', 1)""")
+            conn.commit()
+            cursor.execute("""SELECT value FROM Settings WHERE key='shards'""")
+            row = cursor.fetchone()
+        self.shards = row[0]
+        self.__pepper = self.__load_pepper(conn)
+        conn.close()
+
+        for path in self.shard_paths():
+            self.__upgrade_shard(path)
+
+    def __load_pepper(self, conn) -> bytes:
+        """
+        Returns the fingerprint key, creating it on first use.
+
+        The key never lives in the database, so a copy of the database alone cannot be used to brute-force
+        the passwords through their fingerprints. It is read from the environment variable `PEPPER_ENV` (hex)
+        when set, otherwise from a key file next to the database ('Users.key'), created readable by its owner only.
+        A key that older versions stored in the 'Settings' table is moved into the key file.
+
+        Args:
+            conn (sqlite3.Connection): A connection to the database holding the settings.
+
+        Returns:
+            bytes: The key.
+        """
+        key_path = f"{os.path.splitext(self.db_name)[0]}.key"
+        stored = conn.execute("""SELECT value FROM Settings WHERE key='pepper'""").fetchone()
+        if not os.path.exists(key_path) and (stored is not None or not os.environ.get(self.PEPPER_ENV)):
+            # Write the key under a temporary name and link it into place, a concurrent start keeps the first key
+            temporary = f"{key_path}.{os.getpid()}.tmp"
+            descriptor = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(descriptor, "w") as file:
+                file.write((stored[0] if stored is not None else os.urandom(32)).hex())
+            try:
+                os.link(temporary, key_path)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(temporary)
+        if stored is not None:
+            log.warning(f"Moving the password fingerprint key out of the database into {key_path}")
+            conn.execute("""DELETE FROM Settings WHERE key='pepper'""")
+            conn.commit()
+
+        if os.environ.get(self.PEPPER_ENV):
+            return bytes.fromhex(os.environ[self.PEPPER_ENV])
+        with open(key_path) as file:
+            return bytes.fromhex(file.read().strip())
+
+    def __upgrade_shard(self, path: str):
+        """
+        Brings the user tables of a shard up to the current schema.
+
+        The 'History' table keeps one row per generated exam holding a bitset
+        of the question indexes that exam used, per subject as every subject has its own bank,
+        with the lineage of the bank the indexes belong to.
+
+        Plaintext passwords of older databases are migrated to salted hashes,
+        with an indexed keyed fingerprint that keeps the uniqueness rule an index lookup.
+        They are hashed outside of any transaction and committed `MIGRATION_BATCH` rows at a time,
+        so other processes starting meanwhile only wait for a short write.
+
+        Args:
+            path (str): The path of the shard, the database itself when it is not sharded.
+        """
+        conn = sqlite3.connect(path)
+        cursor = conn.cursor()
+
+        # Create the exam history table and its lookup index
         cursor.execute(
-            """CREATE TABLE Users (
+            """CREATE TABLE IF NOT EXISTS History (
                             id INTEGER PRIMARY KEY,
-                            username TEXT NOT NULL UNIQUE,
-                            password TEXT NOT NULL,
-                            titles_to_exclude TEXT);"""
+                            username TEXT NOT NULL,
+                            subject TEXT NOT NULL DEFAULT '',
+                            questions BLOB NOT NULL,
+                            bank TEXT NOT NULL DEFAULT '');"""
+        )
+        cursor.execute("""PRAGMA table_info(History)""")
+        history_columns = [column[1] for column in cursor.fetchall()]
+        if "subject" not in history_columns:
+            cursor.execute("""ALTER TABLE History ADD COLUMN subject TEXT NOT NULL DEFAULT ''""")
+        if "bank" not in history_columns:
+            cursor.execute("""ALTER TABLE History ADD COLUMN bank TEXT NOT NULL DEFAULT ''""")
+        cursor.execute("""DROP INDEX IF EXISTS History_username""")
+        cursor.execute(
+            """CREATE INDEX IF NOT EXISTS History_subject ON History (username, subject, id);"""
+        )
+
+        # Create the token buckets of the exam generation rate limit
+        cursor.execute(
+            """CREATE TABLE IF NOT EXISTS RateLimits (
+                            username TEXT PRIMARY KEY,
+                            tokens REAL NOT NULL,
+                            updated REAL NOT NULL);"""
+        )
+
+        # Add the fingerprint column to databases created before it existed
+        cursor.execute("""PRAGMA table_info(Users)""")
+        if "password_fingerprint" not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute("""ALTER TABLE Users ADD COLUMN password_fingerprint TEXT""")
+        cursor.execute(
+            """CREATE INDEX IF NOT EXISTS Users_fingerprint ON Users (password_fingerprint);"""
         )
 
-        # Commit the changes to the database
         conn.commit()
-        # Close the connection to the database
+
+        # Migrate the plaintext passwords, only rows without a fingerprint are still plaintext
+        while True:
+            cursor.execute(
+                """SELECT id, password FROM Users WHERE password_fingerprint IS NULL LIMIT ?""",
+                (self.MIGRATION_BATCH,),
+            )
+            plaintext_rows = cursor.fetchall()
+            if not plaintext_rows:
+                break
+            log.warning(f"Migrating {len(plaintext_rows)} plaintext passwords to salted hashes")
+            migrated = [
+                (self.__hash_password(password), self.__fingerprint(password), row_id)
+                for row_id, password in plaintext_rows
+            ]
+            # Another process may have migrated the same rows meanwhile, never hash a hash
+            cursor.executemany(
+                """UPDATE Users SET password=?, password_fingerprint=? WHERE id=? AND password_fingerprint IS NULL""",
+                migrated,
+            )
+            conn.commit()
         conn.close()
 
-    def verify_password(self, username, password) -> bool:
+    def shard_paths(self, shards: int = None) -> list[str]:
+        """
+        Returns the paths of the shards, in shard order.
+
+        An unsharded database (1 shard) keeps the user tables in the database itself,
+        N shards live next to it as 'Users.shard<i>of<N>.db'.
+
+        Args:
+            shards (int, optional): The amount of shards. Defaults to the current amount.
+
+        Returns:
+            list[str]: The paths of the shards.
+        """
+        shards = shards or self.shards
+        if shards == 1:
+            return [self.db_name]
+        root, extension = os.path.splitext(self.db_name)
+        return [f"{root}.shard{index}of{shards}{extension}" for index in range(shards)]
+
+    @staticmethod
+    def shard_of(username: str, shards: int) -> int:
+        """
+        Returns the shard of a username, a stable hash so it is the same in every process and version.
+
+        Args:
+            username (str): The username.
+            shards (int): The amount of shards.
+
+        Returns:
+            int: The index of the shard.
+        """
+        digest = hashlib.blake2b(username.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % shards
+
+    def reshard(self, shards: int) -> bool:
+        """
+        Moves every user, with their exam history and rate limit, into a new amount of shards.
+
+        The new shards are written next to the current ones and only then switched to,
+        by changing the shard count in the 'Settings' table. No request may run while resharding.
+
+        Args:
+            shards (int): The new amount of shards, 1 to keep every user in the database itself.
+
+        Returns:
+            bool: True if the users were moved, False otherwise.
+        """
+        try:
+            if shards < 1:
+                log.critical(f"Invalid amount of shards: {shards}")
+                return False
+            if shards == self.shards:
+                log.info(f"The user database already has {shards} shards")
+                return True
+            self.__disconnect()
+            old_paths = self.shard_paths()
+            new_paths = self.shard_paths(shards)
+            log.info(f"Resharding the user database from {self.shards} to {shards} shards")
+
+            # Create the new shards under temporary names, an unsharded database is filled in place
+            targets = []
+            for path in new_paths:
+                target = path if path == self.db_name else f"{path}.tmp"
+                if target != self.db_name and os.path.exists(target):
+                    os.remove(target)
+                conn = sqlite3.connect(target)
+                conn.execute(self.USERS_SCHEMA.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS"))
+                conn.commit()
+                conn.close()
+                self.__upgrade_shard(target)
+                targets.append(sqlite3.connect(target))
+
+            # Route every row to its new shard, in id order so the history of every user keeps its order
+            moved = 0
+            for path in old_paths:
+                source = sqlite3.connect(path)
+                for table, columns in (
+                        ("Users", "username, password, titles_to_exclude, password_fingerprint"),
+                        ("History", "username, subject, questions, bank"),
+                        ("RateLimits", "username, tokens, updated"),
+                ):
+                    rows = source.execute(f"SELECT {columns} FROM {table} ORDER BY rowid")
+                    placeholders = ",".join("?" * len(columns.split(",")))
+                    while batch := rows.fetchmany(10_000):
+                        routed = [[] for _ in targets]
+                        for row in batch:
+                            routed[self.shard_of(row[0], shards)].append(row)
+                        for target, target_rows in zip(targets, routed):
+                            target.executemany(
+                                f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", target_rows
+                            )
+                        if table == "Users":
+                            moved += len(batch)
+                source.close()
+            for target in targets:
+                target.commit()
+                target.close()
+
+            # Switch to the new shards, then drop the old ones
+            for path in new_paths:
+                if path != self.db_name:
+                    os.replace(f"{path}.tmp", path)
+            conn = sqlite3.connect(self.db_name)
+            conn.execute("""UPDATE Settings SET value=? WHERE key='shards'""", (shards,))
+            if self.db_name not in new_paths:
+                for table in ("Users", "History", "RateLimits"):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.commit()
+            conn.close()
+            for path in old_paths:
+                if path != self.db_name:
+                    os.remove(path)
+
+            self.shards = shards
+            log.info(f"Moved {moved} users into {shards} shards")
+            return True
+        except Exception as e:
+            log.error(f"An error occurred while resharding the user database. as {e}")
+            return False
+
+    @staticmethod
+    def __hash_password(password: str, salt: bytes = None, iterations: int = None) -> str:
+        """
+        Hashes a password with PBKDF2-SHA256 and a random salt.
+
+        Args:
+            password (str): The password to hash.
+            salt (bytes, optional): The salt to use. Defaults to 16 random bytes.
+            iterations (int, optional): The iteration count. Defaults to SQL.HASH_ITERATIONS.
+
+        Returns:
+            str: The hash in the format 'pbkdf2_sha256$iterations$salt$hash'.
+        """
+        salt = salt or os.urandom(16)
+        iterations = iterations or SQL.HASH_ITERATIONS
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+        return f"pbkdf2_sha256${iterations}${salt.hex()}${digest.hex()}"
+
+    @staticmethod
+    def __check_password(password: str, stored_hash: str) -> bool:
+        """
+        Checks a password against a hash made by `__hash_password`.
+
+        Args:
+            password (str): The password to check.
+            stored_hash (str): The stored hash.
+
+        Returns:
+            bool: True if the password matches, False otherwise.
+        """
+        algorithm, iterations, salt, digest = stored_hash.split("$")
+        if algorithm != "pbkdf2_sha256":
+            return False
+        expected = SQL.__hash_password(password, bytes.fromhex(salt), int(iterations))
+        return hmac.compare_digest(expected.split("$")[3], digest)
+
+    def __fingerprint(self, password: str) -> str:
+        """
+        Returns the keyed fingerprint of a password.
+
+        The fingerprint is deterministic, so it can be indexed to enforce that passwords are unique,
+        while the server-wide key keeps it useless without access to the database.
+
+        Args:
+            password (str): The password to fingerprint.
+
+        Returns:
+            str: The hex fingerprint.
+        """
+        return hashlib.blake2b(
+            password.encode("utf-8"), key=self.__pepper, digest_size=32
+        ).hexdigest()
+
+    def verify_password(self, username, password, use_replica=False) -> bool:
         """
         Verifies the password for a given username.
 
         Args:
             username (str): The username to verify the password for.
             password (str): The password to verify.
+            use_replica (bool, optional): Read the user from the in-memory copy, if any. Only exam generation
+                may, user management must see removed users at once. Defaults to False.
         """
         try:
             colorlog.debug(f"Verifying password of {username}")
-            # Establish a connection to the database
-            self.__connect()
+            query = "SELECT password FROM Users WHERE username=?"
 
-            # Query the database to retrieve the stored password for the given username
-            self.cursor.execute(
-                "SELECT password FROM Users WHERE username=?", (username,)
-            )
+            # Read the stored hash from the in-memory copy, a user it does not know yet may have just been created
+            result = self.__read_replica(username, query) if use_replica else None
+            if result is None:
+                # Establish a connection to the shard of the user
+                self.__connect(username)
 
-            # Fetch the query result
-            result = self.cursor.fetchone()
+                # Query the database to retrieve the stored hash for the given username (a unique index lookup)
+                self.cursor.execute(query, (username,))
 
-            # Close the database connection
-            self.__disconnect()
+                # Fetch the query result
+                result = self.cursor.fetchone()
+
+                # Close the database connection
+                self.__disconnect()
 
             # Check if a result was found
             if result:
-                # Extract the stored password from the result
-                stored_password = result[0]
+                # Extract the stored hash from the result
+                stored_hash = result[0]
 
-                # Compare the provided password with the stored password
-                if password == stored_password:
+                # Hash the provided password with the stored salt and compare
+                if self.__check_password(password, stored_hash):
                     # Return True if the passwords match
                     return True
 
@@ -213,8 +617,8 @@ class SQL:
         """
         try:
             colorlog.debug(f"Creating database entry for {username}")
-            # Connect to the database
-            self.__connect()
+            # Connect to the shard of the user
+            self.__connect(username)
 
             # Check if the username already exists
             self.cursor.execute("SELECT * FROM users WHERE username=?", (username,))
@@ -227,13 +631,15 @@ class SQL:
                 return False
 
             # Create a new database entry for the user
-            self.__connect()
+            self.__connect(username)
             self.cursor.execute(
-                "INSERT INTO users (username, password) VALUES (?,?)",
-                (username, password),
+                "INSERT INTO users (username, password, password_fingerprint) VALUES (?,?,?)",
+                (username, self.__hash_password(password), self.__fingerprint(password)),
             )
             self.conn.commit()
             self.__disconnect()
+            if self.replica is not None:
+                self.replica.changed()
 
             # Add exclusion titles to the database
             sql.add_exclusion_db(username, exclusion_titles, "CDB")
@@ -257,8 +663,8 @@ class SQL:
         """
         try:
             colorlog.debug(f"Removing data for {username}")
-            # Connect to the database
-            self.__connect()
+            # Connect to the shard of the user
+            self.__connect(username)
 
             # Check if the user exists
             self.cursor.execute("SELECT * FROM Users WHERE username=?", (username,))
@@ -272,8 +678,8 @@ class SQL:
                 log.warning(f"User does not exist: {username}")
                 return False
 
-            # Connect to the database again
-            self.__connect()
+            # Connect to the shard of the user again
+            self.__connect(username)
 
             # Delete the user from the database
             self.cursor.execute("DELETE FROM Users WHERE username=?", (username,))
@@ -281,6 +687,8 @@ class SQL:
 
             # Disconnect from the database
             self.__disconnect()
+            if self.replica is not None:
+                self.replica.changed()
 
             # Return a success message
             log.info(f"Successfully removed data for {username}")
@@ -326,28 +734,32 @@ class SQL:
             log.error(f"An error occurred while adding exclusion titles. as {e}")
             return False
 
-    def get_excluded_titles(self, username) -> list[str] | bool:
+    def get_excluded_titles(self, username, use_replica=False) -> list[str] | bool:
         """
         Retrieves the excluded titles for a given username from the database.
 
         Args:
             username (str): The username to retrieve excluded titles for.
+            use_replica (bool, optional): Read the user from the in-memory copy, if any. Defaults to False.
         """
         try:
             colorlog.debug(f"Retrieving excluded titles for {username}")
-            # Establish a connection to the database
-            self.__connect()
+            query = """SELECT titles_to_exclude FROM Users WHERE username=?"""
 
-            # Execute a query to retrieve the excluded titles for the given username
-            self.cursor.execute(
-                """SELECT titles_to_exclude FROM Users WHERE username=?""", (username,)
-            )
+            # Read the excluded titles from the in-memory copy if it is recent enough
+            result = self.__read_replica(username, query) if use_replica else None
+            if result is None:
+                # Establish a connection to the shard of the user
+                self.__connect(username)
 
-            # Fetch the result of the query
-            result = self.cursor.fetchone()
+                # Execute a query to retrieve the excluded titles for the given username
+                self.cursor.execute(query, (username,))
 
-            # Close the database connection
-            self.__disconnect()
+                # Fetch the result of the query
+                result = self.cursor.fetchone()
+
+                # Close the database connection
+                self.__disconnect()
 
             # If a result was found, process it
             if result:
@@ -377,21 +789,270 @@ class SQL:
         Returns:
             bool: True if the password exists, False otherwise.
         """
-        # Connect to the SQLite database
-        self.__connect()
+        # Passwords are stored salted, so look the password up by its indexed fingerprint
+        query = "SELECT 1 FROM Users WHERE password_fingerprint = ? LIMIT 1"
+        fingerprint = self.__fingerprint(password)
+
+        # Any user may hold the password, so ask every shard and stop at the first match
+        for path in self.shard_paths():
+            self.__connect(path=path)
+            self.cursor.execute(query, (fingerprint,))
+            result = self.cursor.fetchone()
+            self.__disconnect()
+            if result is not None:
+                return True
+
+        # Return False if no shard holds the password
+        return False
+
+    def add_exam_history(self, username: str, exam_mask: int, keep: int, subject="", bank="") -> bool:
+        """
+        Records the questions used by a generated exam and drops history older than `keep` exams.
+
+        Args:
+            username (str): The username the exam was generated for.
+            exam_mask (int): A bitset of the question indexes used by the exam.
+            keep (int): The amount of most recent exams to keep for the user.
+            subject (str, optional): The subject of the exam. Defaults to "".
+            bank (str, optional): The lineage of the bank the indexes belong to. Defaults to "".
+
+        Returns:
+            bool: True if the history was recorded, False otherwise.
+        """
+        try:
+            colorlog.debug(f"Recording exam history for {username}")
+            self.__connect(username)
+
+            # Store the exam as a bitset so reading it back is a single OR per exam
+            self.cursor.execute(
+                "INSERT INTO History (username, subject, questions, bank) VALUES (?,?,?,?)",
+                (username, subject, BITSET.to_bytes(exam_mask), bank),
+            )
+
+            # Remove everything but the last `keep` exams of the user in this subject
+            self.cursor.execute(
+                """DELETE FROM History WHERE username=? AND subject=? AND id NOT IN
+                   (SELECT id FROM History WHERE username=? AND subject=? ORDER BY id DESC LIMIT ?)""",
+                (username, subject, username, subject, keep),
+            )
+            self.conn.commit()
+            self.__disconnect()
+            return True
+        except Exception as e:
+            log.error(f"An error occurred while recording exam history. as {e}")
+            return False
+
+    def take_token(self, username: str, burst: int, per_minute: float) -> bool:
+        """
+        Takes a token from the user's exam generation bucket.
+
+        The bucket holds up to `burst` tokens and refills with `per_minute` tokens a minute.
+        It is updated in an immediate transaction, so every process handling requests shares the same limit.
+
+        Args:
+            username (str): The username to take the token for.
+            burst (int): The most tokens the bucket holds.
+            per_minute (float): The tokens added to the bucket every minute.
+
+        Returns:
+            bool: True if a token was taken, False if the bucket is empty.
+        """
+        try:
+            self.__connect(username)
+            self.cursor.execute("BEGIN IMMEDIATE")
+            self.cursor.execute(
+                "SELECT tokens, updated FROM RateLimits WHERE username=?", (username,)
+            )
+            bucket = self.cursor.fetchone()
+            now = time.time()
+            if bucket is None:
+                tokens = burst
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * per_minute / 60)
+
+            # Take the token if there is a whole one
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO RateLimits (username, tokens, updated) VALUES (?,?,?)",
+                (username, tokens, now),
+            )
+            self.conn.commit()
+            self.__disconnect()
+            return allowed
+        except Exception as e:
+            # Never refuse a request because the limit itself failed
+            log.error(f"An error occurred while updating the rate limit. as {e}")
+            self.__disconnect()
+            return True
+
+    def get_recent_questions(self, username: str, amount: int, subject="", bank="") -> int | bool:
+        """
+        Retrieves a bitset of every question the user received in their last `amount` exams of a subject.
+
+        The bitsets hold row positions, so exams drawn from another lineage of the bank are ignored:
+        once rows were edited, removed or reordered, the same position may be a different question.
+
+        Args:
+            username (str): The username to retrieve the history for.
+            amount (int): The amount of most recent exams to include.
+            subject (str, optional): The subject of the exams. Defaults to "".
+            bank (str, optional): The lineage of the current bank. Defaults to "".
+
+        Returns:
+            int: The union of the question bitsets, 0 if the user has no history.
+            bool: False if an error occurs.
+        """
+        try:
+            colorlog.debug(f"Retrieving recent questions for {username}")
+            self.__connect(username)
+            self.cursor.execute(
+                "SELECT questions, bank FROM History WHERE username=? AND subject=? ORDER BY id DESC LIMIT ?",
+                (username, subject, amount),
+            )
+            rows = self.cursor.fetchall()
+            self.__disconnect()
+
+            # Union the per-exam bitsets, the cost depends on the bank size and not on the history length
+            seen_mask = 0
+            for row in rows:
+                if row[1] == bank:
+                    seen_mask |= BITSET.from_bytes(row[0])
+            return seen_mask
+        except Exception as e:
+            log.error(f"An error occurred while retrieving recent questions. as {e}")
+            return False
+
+
+class REPLICA:
+    """
+    An in-memory copy of the user database, so the reads of exam generation do not wait for writers.
+
+    Every shard is copied with the SQLite backup API. A background thread checks the files for commits
+    of any process every `max_staleness / 4` seconds and copies the changed ones again,
+    right away after a user is changed through `SQL`. Reads from a copy older than `max_staleness`
+    seconds return None, and go to the file instead.
+    """
+
+    def __init__(self, paths: list[str], max_staleness=1.0):
+        """
+        Initializes the replica.
+
+        Args:
+            paths (list[str]): The paths of the shards to copy.
+            max_staleness (float, optional): The oldest copy in seconds reads are served from. Defaults to 1.0.
+        """
+        self.paths = paths
+        self.max_staleness = max_staleness
+        self.interval = max_staleness / 4
+        self.refreshes = 0
+        self.worst_staleness = 0.0
+        # The staleness of the copy the last read was served from, None if it went to the file
+        self.last_staleness = None
+        self.__copies = {}
+        self.__synced_at = {}
+        self.__watched = {}
+        self.__versions = {}
+        self.__lock = threading.Lock()
+        self.__changed = threading.Event()
+        self.__stopped = threading.Event()
+
+    def start(self) -> bool:
+        """
+        Copies every shard and starts watching them.
 
-        # SQL query to find any user whose password matches the given password
-        query = "SELECT COUNT(*) FROM Users WHERE password = ?"
-        self.cursor.execute(query, (password,))
+        Returns:
+            bool: True if every shard was copied, False otherwise.
+        """
+        try:
+            for path in self.paths:
+                self.__watched[path] = sqlite3.connect(path, check_same_thread=False)
+                self.__refresh(path)
+        except Exception as e:
+            log.error(f"An error occurred while copying the user database into memory. as {e}")
+            return False
+        threading.Thread(target=self.__watch, name="replica-watcher", daemon=True).start()
+        log.info(f"Serving user reads from an in-memory copy of {len(self.paths)} database file(s)")
+        return True
+
+    def stop(self):
+        """
+        Stops refreshing the copies, reads then go to the files once the copies are too old.
+        """
+        self.__stopped.set()
+        self.__changed.set()
 
-        # Fetch the result of the query
-        count = self.cursor.fetchone()[0]
+    def changed(self):
+        """
+        Wakes the watcher after a write through `SQL`, so the copy catches up without waiting for the interval.
+        """
+        self.__changed.set()
+
+    def staleness(self, path: str) -> float:
+        """
+        Returns the seconds since the copy of a shard was last known to match the file.
+        """
+        return time.time() - self.__synced_at.get(path, 0)
+
+    def read(self, path: str, query: str, parameters: tuple) -> list[tuple] | None:
+        """
+        Runs a read-only query on the copy of a shard.
 
-        # Close the database connection
-        self.__disconnect()
+        Args:
+            path (str): The path of the shard.
+            query (str): The query.
+            parameters (tuple): The parameters of the query.
 
-        # Return True if the password exists (count > 0), False otherwise
-        return count > 0
+        Returns:
+            list[tuple]: The rows of the query.
+            None: If the copy is too old, the caller must read the file instead.
+        """
+        with self.__lock:
+            staleness = self.staleness(path)
+            if staleness > self.max_staleness:
+                self.last_staleness = None
+                return None
+            self.last_staleness = staleness
+            self.worst_staleness = max(self.worst_staleness, staleness)
+            return self.__copies[path].execute(query, parameters).fetchall()
+
+    def __refresh(self, path: str):
+        """
+        Copies a shard into a new in-memory database and swaps it in.
+        """
+        checked_at = time.time()
+        source = self.__watched[path]
+        # Read the version first, so a commit during the copy triggers another one
+        self.__versions[path] = source.execute("PRAGMA data_version").fetchone()[0]
+        copy = sqlite3.connect(":memory:", check_same_thread=False)
+        source.backup(copy)
+        with self.__lock:
+            previous = self.__copies.get(path)
+            self.__copies[path] = copy
+            self.__synced_at[path] = checked_at
+        if previous is not None:
+            previous.close()
+        self.refreshes += 1
+
+    def __watch(self):
+        """
+        Refreshes the copies of the shards that changed, runs on the watcher thread.
+        """
+        while not self.__stopped.is_set():
+            self.__changed.wait(self.interval)
+            self.__changed.clear()
+            for path in self.paths:
+                try:
+                    checked_at = time.time()
+                    version = self.__watched[path].execute("PRAGMA data_version").fetchone()[0]
+                    if version == self.__versions[path]:
+                        self.__synced_at[path] = checked_at
+                    else:
+                        self.__refresh(path)
+                except Exception as e:
+                    # Keep serving the old copy, reads go to the file once it is too old
+                    log.warning(f"Could not refresh the in-memory copy of {path}. as {e}")
 
 
 class LOG:
@@ -594,116 +1255,2443 @@ class LOG:
             )
 
 
+class BITSET:
+    """
+    Helpers for using python integers as bitsets over question indexes.
 
-class DATABASE:
-    def __init__(self):
-        """
-        Initializes the database.
-
-        This method checks if the "users.db" file exists. If it doesn't, it logs a message and creates
-        the database using the `sql.create_db()` function.
+    Bit `i` of a bitset is set when the question at index `i` of the bank is part of the set,
+    which makes unions and differences of large sets a single C-level operation.
+    """
 
-        It also checks if the "cat" and ".core/.ps1" files exist. If any of them are missing, it exits
-        the program with an error message.
+    # The positions of the set bits for every possible byte value
+    __BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
 
-        Additionally, it checks if the size of the ".core/.ps1", "cat", and ".core/.py" files is zero.
-        If any of them are empty, it exits the program with an error message.
+    @staticmethod
+    def full(size: int) -> int:
+        """
+        Returns a bitset containing every index below `size`.
 
-        Finally, it logs a success message.
+        Args:
+            size (int): The amount of indexes.
 
         Returns:
-            None
+            int: The bitset.
         """
-        if not os.path.exists("users.db"):
-            colorlog.debug("Creating user database from scratch using SQLite")
-            sql.create_db()
-        log.info("Database loaded successfully.")
+        return (1 << size) - 1
 
     @staticmethod
-    def __error(error):
+    def from_indexes(indexes, size: int) -> int:
         """
-        Logs an error message to the log file.
+        Builds a bitset from an iterable of indexes in linear time.
+
+        Args:
+            indexes (Iterable[int]): The indexes to set, all of them below `size`.
+            size (int): The amount of indexes the bitset covers.
 
         Returns:
-            None
+            int: The bitset.
         """
-        if os.path.exists("ERROR.temp"):
+        bits = bytearray((size + 7) // 8)
+        for index in indexes:
+            bits[index >> 3] |= 1 << (index & 7)
+        return int.from_bytes(bits, "little")
+
+    @staticmethod
+    def to_indexes(mask: int) -> list[int]:
+        """
+        Returns the indexes of every set bit of a bitset in ascending order.
+
+        Args:
+            mask (int): The bitset.
+
+        Returns:
+            list[int]: The indexes.
+        """
+        byte_bits = BITSET.__BYTE_BITS
+        data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+        return [
+            position * 8 + bit
+            for position, byte in enumerate(data)
+            if byte
+            for bit in byte_bits[byte]
+        ]
+
+    @staticmethod
+    def to_bytes(mask: int) -> bytes:
+        """
+        Serializes a bitset for storage in the database.
+
+        Args:
+            mask (int): The bitset.
+
+        Returns:
+            bytes: The little endian bytes of the bitset.
+        """
+        return mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+
+    @staticmethod
+    def from_bytes(data: bytes) -> int:
+        """
+        Deserializes a bitset stored with `BITSET.to_bytes`.
+
+        Args:
+            data (bytes): The little endian bytes of the bitset.
+
+        Returns:
+            int: The bitset.
+        """
+        return int.from_bytes(data, "little")
+
+
+class BLOCKLIST:
+    """
+    A large common-password blocklist stored as a memory-mapped sorted hash file.
+
+    The file starts with a 16 byte header (magic and entry count) followed by the sorted,
+    de-duplicated 8 byte BLAKE2b digests of every lowercased password in the list.
+    Opening it only maps the file, and a lookup is a binary search over the mapped pages,
+    so loading is constant time and the pages are shared between every process using it.
+    """
+
+    MAGIC = b"EGBL0001"
+    HEADER = struct.Struct("<8sQ")
+    ENTRY = struct.Struct(">Q")
+
+    def __init__(self, filename="Blocklist.bin"):
+        """
+        Opens the blocklist file, a missing file is treated as an empty blocklist.
+
+        A corrupted file is logged and treated as an empty blocklist too, only RUC checks the blocklist,
+        so it must not stop every other request; the built-in list is still checked.
+
+        Args:
+            filename (str, optional): The path of the blocklist file. Defaults to "Blocklist.bin".
+        """
+        self.filename = filename
+        self.__map = None
+        self.count = 0
+        if not os.path.exists(self.filename):
+            colorlog.debug(f"No blocklist found at {self.filename}")
+            return
+
+        try:
+            with open(self.filename, "rb") as file:
+                header = file.read(self.HEADER.size)
+                if len(header) != self.HEADER.size:
+                    raise ValueError(f"Corrupted blocklist file: {self.filename}")
+                magic, count = self.HEADER.unpack(header)
+                if magic != self.MAGIC or os.path.getsize(self.filename) != self.HEADER.size + count * self.ENTRY.size:
+                    raise ValueError(f"Corrupted blocklist file: {self.filename}")
+                if count:
+                    self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.count = count
+        except (OSError, ValueError) as e:
+            log.critical(f"Could not open the blocklist, only the built-in list is checked until it is rebuilt. as {e}")
+
+    @staticmethod
+    def digest(password: str) -> int:
+        """
+        Returns the blocklist digest of a password, passwords are compared case-insensitively.
+
+        Args:
+            password (str): The password.
+
+        Returns:
+            int: The 64 bit digest.
+        """
+        return int.from_bytes(
+            hashlib.blake2b(password.lower().encode("utf-8"), digest_size=8).digest(), "big"
+        )
+
+    def __contains__(self, password: str) -> bool:
+        """
+        Checks if a password is in the blocklist using a binary search over the mapped file.
+
+        Args:
+            password (str): The password to check.
+
+        Returns:
+            bool: True if the password is blocked, False otherwise.
+        """
+        if not self.count:
+            return False
+        target = self.digest(password)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            value = self.ENTRY.unpack_from(self.__map, self.HEADER.size + middle * self.ENTRY.size)[0]
+            if value < target:
+                low = middle + 1
+            elif value > target:
+                high = middle
+            else:
+                return True
+        return False
+
+    @staticmethod
+    def build(source: str, destination: str) -> bool:
+        """
+        Builds a blocklist file from a plain-text list with one password per line.
+
+        The file is written to a temporary path and renamed over the destination,
+        so processes never map a half written blocklist.
+
+        Args:
+            source (str): The path of the plain-text password list.
+            destination (str): The path of the blocklist file to create.
+
+        Returns:
+            bool: True if the blocklist was built, False otherwise.
+        """
+        try:
+            log.info(f"Building blocklist {destination} from {source}")
+            with open(source, "r", encoding="utf-8", errors="ignore") as file:
+                digests = sorted(
+                    {BLOCKLIST.digest(line.rstrip("\r\n")) for line in file if line.strip()}
+                )
+
+            temporary = f"{destination}.tmp"
+            with open(temporary, "wb") as file:
+                file.write(BLOCKLIST.HEADER.pack(BLOCKLIST.MAGIC, len(digests)))
+                file.write(b"".join(BLOCKLIST.ENTRY.pack(value) for value in digests))
+            os.replace(temporary, destination)
+
+            log.info(f"Blocklist built with {len(digests)} passwords")
+            return True
+        except Exception as e:
+            log.error(f"An error occurred while building the blocklist. as {e}")
+            return False
+
+
+class STATUS:
+    """
+    The status manifest of a single request.
+
+    Requests that carry a `request_id` write their outputs into their own directory,
+    and finish by publishing a `status.json` manifest (result code, stage timings, output path)
+    into it with an atomic rename, so a front end never reads a half written manifest.
+    """
+
+    def __init__(self, request_id: str, directory: str):
+        """
+        Starts the timers of a request.
+
+        Args:
+            request_id (str): The id of the request.
+            directory (str): The directory the request writes its outputs into.
+        """
+        self.request_id = request_id
+        self.directory = directory
+        self.api = ""
+        self.code = "OK"
+        self.output = None
+        self.deferred = False
+        self.timings = {}
+        self.details = {}
+        self.started_at = datetime.now().isoformat(timespec="milliseconds")
+        self.__started = self.__last = time.perf_counter()
+
+    def mark(self, stage: str):
+        """
+        Records the time spent since the previous mark under the given stage name.
+
+        Args:
+            stage (str): The name of the stage that just finished.
+        """
+        now = time.perf_counter()
+        self.timings[stage] = round((now - self.__last) * 1000, 3)
+        self.__last = now
+
+    def publish(self) -> bool:
+        """
+        Writes the manifest to a temporary file and atomically renames it to 'status.json'.
+
+        Returns:
+            bool: True if the manifest was published, False otherwise.
+        """
+        try:
+            manifest = {
+                "request_id": self.request_id,
+                "api": self.api,
+                "code": self.code,
+                "output": self.output,
+                "started_at": self.started_at,
+                "finished_at": datetime.now().isoformat(timespec="milliseconds"),
+                "total_ms": round((time.perf_counter() - self.__started) * 1000, 3),
+                "timings_ms": self.timings,
+                "details": self.details,
+            }
+            path = os.path.join(self.directory, "status.json")
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(manifest, f, indent=4)
+            os.replace(f"{path}.tmp", path)
+            return True
+        except Exception as e:
+            log.error(f"An error occurred while publishing the request status. as {e}")
+            return False
+
+
+class PACKET:
+    """
+    A class packet, the exams of every student of a class in a single file.
+
+    Every exam is written into the packet as soon as it is generated, so memory does not grow with the class size:
+    'xlsx' packets are one workbook with a 'Summary' sheet and a sheet per student, written in the write-only mode
+    of openpyxl, which streams every finished sheet to a temporary file; 'zip' packets hold an 'Exam_<student>.xlsx'
+    per student and a 'Summary.xlsx'. The packet is written to a temporary file and renamed into place once complete.
+    """
+
+    FORMATS = ("xlsx", "zip")
+    SUMMARY_HEADERS = ["Student", "Sheet", "Total points", "Titles used", "Points deviation", "Titles missing"]
+
+    def __init__(self, path: str, packet_format="xlsx", debug=False):
+        """
+        Starts an empty packet.
+
+        Args:
+            path (str): The path of the packet once complete.
+            packet_format (str, optional): 'xlsx' or 'zip'. Defaults to "xlsx".
+            debug (bool, optional): Include the type and difficulty of every question. Defaults to False.
+        """
+        self.path = path
+        self.format = packet_format
+        self.debug = debug
+        self.exams = 0
+        self.headers = ["URL", "Data", "Type", "Range", "Weight"] if debug else ["URL", "Data", "Weight"]
+        self.__temporary = f"{path}.tmp"
+        # Sheet and file names are case-insensitive, 'Summary' is taken by the summary
+        self.__names = {"summary"}
+        self.__book = Workbook(write_only=True)
+        self.__summary = self.__book.create_sheet("Summary")
+        self.__summary.append(self.SUMMARY_HEADERS)
+        self.__archive = None
+        if packet_format == "zip":
+            self.__archive = zipfile.ZipFile(self.__temporary, "w", zipfile.ZIP_DEFLATED)
+
+    def __unique_name(self, student: str) -> str:
+        """
+        Returns a sheet name for a student, at most 31 characters long and unique within the packet.
+        """
+        name = student[:31]
+        suffix = 1
+        while name.lower() in self.__names:
+            suffix += 1
+            name = f"{student[:31 - len(str(suffix)) - 1]}_{suffix}"
+        self.__names.add(name.lower())
+        return name
+
+    def __write_exam(self, sheet, exam: list[list[str]]):
+        """
+        Writes the rows of an exam to a write-only sheet and closes it, which moves it out of memory.
+        """
+        sheet.append(self.headers)
+        for row in exam:
+            if self.debug:
+                sheet.append([row[4], row[0], row[1], row[2], row[3]])
+            else:
+                sheet.append([row[4], row[0], row[3]])
+        sheet.close()
+
+    def add(self, student: str, exam: list[list[str]], total_points: int, titles: int, deviation: dict[str, int]):
+        """
+        Writes the exam of a student into the packet.
+
+        Args:
+            student (str): The name of the student.
+            exam (list[list[str]]): The questions of the exam, as rows in the CSV layout.
+            total_points (int): The total points of the exam.
+            titles (int): The amount of titles the exam uses.
+            deviation (dict[str, int]): How far the exam is from the rules.
+        """
+        name = self.__unique_name(student)
+        if self.__archive is None:
+            self.__write_exam(self.__book.create_sheet(name), exam)
+        else:
+            book = Workbook(write_only=True)
+            self.__write_exam(book.create_sheet("Exam"), exam)
+            with self.__archive.open(f"Exam_{name}.xlsx", "w") as file:
+                book.save(file)
+        self.__summary.append([student, name, total_points, titles, deviation["points"], deviation["titles"]])
+        self.exams += 1
+
+    def close(self):
+        """
+        Finishes the packet and renames it into place.
+        """
+        if self.__archive is None:
+            self.__book.save(self.__temporary)
+        else:
+            with self.__archive.open("Summary.xlsx", "w") as file:
+                self.__book.save(file)
+            self.__archive.close()
+        os.replace(self.__temporary, self.path)
+
+    def abort(self):
+        """
+        Drops an unfinished packet.
+        """
+        if self.__archive is not None:
+            self.__archive.close()
+        if os.path.exists(self.__temporary):
+            os.remove(self.__temporary)
+
+
+class PIPELINE:
+    """
+    The output stage of a long-running worker.
+
+    Generating an exam is mostly SQLite and CPU work, writing its workbook mostly compression and disk I/O.
+    The exams handed to the pipeline wait in a bounded queue and are written, in the order they were handed over,
+    by a single output thread while the worker goes on with the next requests; when the queue is full the worker
+    waits for a free slot, so finished exams never pile up in memory. The status manifest of every request
+    is published once its output is written, so a front end sees the same manifests as without the pipeline.
+    Whatever must only happen once the output exists, like recording the exam history, runs after the write.
+    """
+
+    def __init__(self, writer, depth=4):
+        """
+        Starts the output thread.
+
+        Args:
+            writer (callable): Writes an exam, called as `writer(exam, summary, output_dir, debug)` and returns a bool.
+            depth (int, optional): The most exams waiting to be written. Defaults to 4.
+        """
+        self.depth = depth
+        self.written = 0
+        self.failed = 0
+        self.__writer = writer
+        self.__queue = queue.Queue(maxsize=depth)
+        self.__pending = Counter()
+        self.__written = threading.Condition()
+        threading.Thread(target=self.__run, name="output-stage", daemon=True).start()
+
+    def submit(self, status: STATUS, output_dir: str, exam, summary=None, debug=False, username=None, after=None):
+        """
+        Hands the output of a request to the output stage, waiting while the queue is full.
+
+        The request must not touch its status after this, the output thread publishes it.
+
+        Args:
+            status (STATUS): The status manifest of the request.
+            output_dir (str): The directory to write 'Exam.xlsx' into.
+            exam (list[list[str]]): The questions of the exam, as rows in the CSV layout.
+            summary (dict, optional): Values to write to a second 'Summary' sheet. Defaults to None.
+            debug (bool, optional): Write the debug columns. Defaults to False.
+            username (str, optional): The user of the exam, see `wait_for`. Defaults to None.
+            after (callable, optional): Called by the output thread once the exam is written,
+                returns False to fail the request. Defaults to None.
+        """
+        status.deferred = True
+        status.mark("handoff")
+        with self.__written:
+            self.__pending[username] += 1
+        self.__queue.put((status, output_dir, exam, summary, debug, username, after))
+
+    def wait_for(self, username: str):
+        """
+        Waits until every exam of a user handed to the output stage is written, so their history is recorded.
+
+        Args:
+            username (str): The username.
+        """
+        with self.__written:
+            self.__written.wait_for(lambda: not self.__pending[username])
+
+    def drain(self):
+        """Waits until every exam handed to the output stage is written and its status published."""
+        self.__queue.join()
+
+    def __run(self):
+        """Writes the queued exams one at a time, in order."""
+        while True:
+            status, output_dir, exam, summary, debug, username, after = self.__queue.get()
+            try:
+                status.mark("output_wait")
+                if self.__writer(exam, summary, output_dir, debug) and (after is None or after()):
+                    status.mark("write_excel")
+                    status.output = os.path.join(output_dir, "Exam.xlsx")
+                    self.written += 1
+                    log.info(f"Exam Generated and saved to {status.output}")
+                else:
+                    status.code = "UKF"
+                    self.failed += 1
+                status.publish()
+            except Exception as e:
+                # The spool config of the request is gone, the front end only learns the result from its manifest
+                log.error(f"An error occurred in the output stage. as {e}")
+                status.code = "UKF"
+                self.failed += 1
+                try:
+                    status.publish()
+                except Exception as e:
+                    log.error(f"Could not publish the status of request {status.request_id}. as {e}")
+            finally:
+                with self.__written:
+                    self.__pending[username] -= 1
+                    if not self.__pending[username]:
+                        del self.__pending[username]
+                    self.__written.notify_all()
+                self.__queue.task_done()
+
+
+class ADMISSION:
+    """
+    Admission control of a long-running worker.
+
+    Pending requests are sorted into lanes by their API code, so a burst of exam generations does not hold up
+    the quick user management requests: the worker always handles the oldest request of the first lane that has one.
+    Every lane is bounded, requests over its capacity are rejected with the OVL error code instead of waiting.
+    The depth, admissions and rejections of every lane are written to 'Metrics/worker-<pid>.json'.
+    """
+
+    # The lanes in the order they are served, and the API codes of each lane (every other code goes to the last lane)
+    LANES = ("users", "generation")
+    GENERATION_APIS = ("REC",)
+
+    def __init__(self, capacities: dict[str, int]):
+        """
+        Initializes the lanes.
+
+        Args:
+            capacities (dict[str, int]): The most pending requests of every lane.
+        """
+        self.capacities = capacities
+        self.depths = {lane: 0 for lane in self.LANES}
+        self.admitted = {lane: 0 for lane in self.LANES}
+        self.rejected = {lane: 0 for lane in self.LANES}
+        self.rate_limited = 0
+        self.replica = None
+        self.__lanes_of = {}
+        self.__path = os.path.join("Metrics", f"worker-{os.getpid()}.json")
+        self.__published = None
+
+    def lane(self, path: str) -> str:
+        """
+        Returns the lane of a pending request, reading its API code only the first time it is seen.
+
+        Args:
+            path (str): The path of the config file of the request.
+
+        Returns:
+            str: The name of the lane.
+        """
+        lane = self.__lanes_of.get(path)
+        if lane is None:
+            try:
+                with open(path) as f:
+                    api = json.load(f).get("api")
+            except Exception:
+                # Unreadable configs fail quickly, they do not need the generation lane
+                api = None
+            lane = "generation" if api in self.GENERATION_APIS else "users"
+            self.__lanes_of[path] = lane
+        return lane
+
+    def sort(self, spool: str, names: list[str]) -> dict[str, list[str]]:
+        """
+        Sorts the pending requests of the spool directory into their lanes.
+
+        Args:
+            spool (str): The spool directory.
+            names (list[str]): The names of the pending config files, in the order they are served.
+
+        Returns:
+            dict[str, list[str]]: The names of the pending requests of every lane.
+        """
+        lanes = {lane: [] for lane in self.LANES}
+        for name in names:
+            lanes[self.lane(os.path.join(spool, name))].append(name)
+
+        # Forget the requests that are no longer pending
+        pending = {os.path.join(spool, name) for name in names}
+        for path in [path for path in self.__lanes_of if path not in pending]:
+            del self.__lanes_of[path]
+
+        for lane, names_of_lane in lanes.items():
+            self.depths[lane] = min(len(names_of_lane), self.capacities[lane])
+        return lanes
+
+    def publish(self):
+        """
+        Writes the metrics of the lanes with an atomic rename, if they changed since they were last written.
+        """
+        try:
+            metrics = {
+                "pid": os.getpid(),
+                "lanes": {
+                    lane: {
+                        "capacity": self.capacities[lane],
+                        "depth": self.depths[lane],
+                        "admitted": self.admitted[lane],
+                        "rejected": self.rejected[lane],
+                    }
+                    for lane in self.LANES
+                },
+                "rate_limited": self.rate_limited,
+            }
+            if self.replica is not None:
+                metrics["replica"] = {
+                    "max_staleness_ms": round(self.replica.max_staleness * 1000, 3),
+                    "worst_staleness_ms": round(self.replica.worst_staleness * 1000, 3),
+                    "refreshes": self.replica.refreshes,
+                }
+            if metrics == self.__published:
+                return
+            self.__published = metrics
+
+            os.makedirs("Metrics", exist_ok=True)
+            with open(f"{self.__path}.tmp", "w") as f:
+                json.dump(dict(metrics, updated_at=datetime.now().isoformat(timespec="milliseconds")), f, indent=4)
+            os.replace(f"{self.__path}.tmp", self.__path)
+        except Exception as e:
+            log.warning(f"Could not publish the worker metrics. as {e}")
+
+
+class JOBS:
+    """
+    A durable queue of requests in a SQLite file, shared by worker processes on one or more hosts.
+
+    Every job holds the config of a request, a priority, and once done its result code and status manifest.
+    Workers claim the next job in an immediate transaction, so two workers never take the same one,
+    and hold it with a lease that they renew while they handle it. A job whose lease expired,
+    because its worker crashed or hung, is queued again, up to `MAX_ATTEMPTS` attempts before it fails.
+    """
+
+    # The attempts a job gets before it fails, a job that crashes its worker must not crash every other one
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, path="Jobs.db"):
+        """
+        Opens the queue, creating it on first use.
+
+        Args:
+            path (str, optional): The path of the queue. Defaults to "Jobs.db".
+        """
+        self.path = path
+        conn = self.__connect()
+        # The default rollback journal, unlike WAL, works for processes on different hosts
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS Jobs (
+                            id INTEGER PRIMARY KEY,
+                            payload TEXT NOT NULL,
+                            priority INTEGER NOT NULL DEFAULT 0,
+                            state TEXT NOT NULL DEFAULT 'queued',
+                            worker TEXT,
+                            lease_until REAL,
+                            attempts INTEGER NOT NULL DEFAULT 0,
+                            submitted_at REAL NOT NULL,
+                            finished_at REAL,
+                            code TEXT,
+                            result TEXT);"""
+        )
+        conn.execute(
+            """CREATE INDEX IF NOT EXISTS Jobs_queued ON Jobs (state, priority DESC, id);"""
+        )
+        conn.close()
+
+    def __connect(self) -> sqlite3.Connection:
+        """
+        Returns a new connection to the queue, every thread and call uses its own.
+        Transactions are started explicitly, so a claim is a single immediate transaction.
+        """
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def submit(self, config: dict, priority=0) -> int:
+        """
+        Queues a request.
+
+        Args:
+            config (dict): The config of the request.
+            priority (int, optional): Jobs with a higher priority are claimed first. Defaults to 0.
+
+        Returns:
+            int: The id of the job.
+        """
+        conn = self.__connect()
+        try:
+            cursor = conn.execute(
+                """INSERT INTO Jobs (payload, priority, submitted_at) VALUES (?,?,?)""",
+                (json.dumps(config), priority, time.time()),
+            )
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def claim(self, worker: str, lease: float) -> tuple[int, dict] | None:
+        """
+        Claims the queued job with the highest priority, oldest first.
+
+        Jobs whose lease expired are queued again first, or failed once they used up their attempts.
+
+        Args:
+            worker (str): The name of the worker claiming the job.
+            lease (float): Seconds the job is held without a renewal.
+
+        Returns:
+            tuple[int, dict]: The id and config of the job.
+            None: If no job is queued.
+        """
+        conn = self.__connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            expired = conn.execute(
+                """SELECT id, worker, attempts FROM Jobs WHERE state='leased' AND lease_until < ?""", (now,)
+            ).fetchall()
+            for job_id, previous_worker, attempts in expired:
+                log.warning(f"The lease of job {job_id} held by {previous_worker} expired")
+                if attempts >= self.MAX_ATTEMPTS:
+                    conn.execute(
+                        """UPDATE Jobs SET state='failed', code='UKF', finished_at=? WHERE id=?""", (now, job_id)
+                    )
+                else:
+                    conn.execute("""UPDATE Jobs SET state='queued', worker=NULL WHERE id=?""", (job_id,))
+
+            job = conn.execute(
+                """SELECT id, payload FROM Jobs WHERE state='queued' ORDER BY priority DESC, id LIMIT 1"""
+            ).fetchone()
+            if job is not None:
+                conn.execute(
+                    """UPDATE Jobs SET state='leased', worker=?, lease_until=?, attempts=attempts + 1 WHERE id=?""",
+                    (worker, now + lease, job[0]),
+                )
+            conn.execute("COMMIT")
+            return None if job is None else (job[0], json.loads(job[1]))
+        finally:
+            conn.close()
+
+    def renew(self, job_id: int, worker: str, lease: float) -> bool:
+        """
+        Extends the lease of a job.
+
+        Returns:
+            bool: True if the worker still holds the job, False if its lease expired and it was taken back.
+        """
+        conn = self.__connect()
+        try:
+            cursor = conn.execute(
+                """UPDATE Jobs SET lease_until=? WHERE id=? AND worker=? AND state='leased'""",
+                (time.time() + lease, job_id, worker),
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def finish(self, job_id: int, worker: str, code: str, result: dict | None) -> bool:
+        """
+        Records the result of a job.
+
+        Args:
+            job_id (int): The id of the job.
+            worker (str): The name of the worker that handled the job.
+            code (str): 'OK' or the error code of the request.
+            result (dict | None): The status manifest of the request.
+
+        Returns:
+            bool: True if the result was recorded, False if the job was taken back from the worker meanwhile.
+        """
+        conn = self.__connect()
+        try:
+            cursor = conn.execute(
+                """UPDATE Jobs SET state=?, code=?, result=?, finished_at=?, lease_until=NULL
+                   WHERE id=? AND worker=? AND state='leased'""",
+                ("done" if code == "OK" else "failed", code, json.dumps(result), time.time(), job_id, worker),
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def get(self, job_id: int) -> dict | None:
+        """
+        Returns the state of a job, None if there is no such job.
+        """
+        conn = self.__connect()
+        try:
+            row = conn.execute(
+                """SELECT state, worker, attempts, code, result FROM Jobs WHERE id=?""", (job_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {
+            "id": job_id,
+            "state": row[0],
+            "worker": row[1],
+            "attempts": row[2],
+            "code": row[3],
+            "result": json.loads(row[4]) if row[4] else None,
+        }
+
+
+class BANK:
+    """
+    A question bank stored column by column in typed arrays.
+
+    Question texts and URLs are kept as one UTF-8 blob each with an offset array,
+    titles and difficulties are interned into small integer codes and scores are pre-parsed,
+    so a row costs a few dozen bytes instead of a list of separate string objects.
+    Question `i` of the bank is row `i` of the CSV file (header excluded).
+
+    A title index lists the rows of every title, so the rows of excluded titles are found
+    without scanning the bank, and the resulting bitsets are cached per set of excluded titles.
+
+    A bank can be published as a memory-mapped file in the same columnar layout,
+    that other processes attach to read-only without copying or parsing anything.
+    """
+
+    DIFFICULTIES = ("Hard", "Medium", "Easy")
+    DIFFICULTY_CODES = {difficulty: code for code, difficulty in enumerate(DIFFICULTIES)}
+
+    # The file layout: magic, header length, JSON header, then every column aligned to 8 bytes
+    MAGIC = b"EGBANK03"
+    COLUMNS = (
+        ("text_offsets", "Q"),
+        ("texts", "B"),
+        ("url_offsets", "Q"),
+        ("urls", "B"),
+        ("title_codes", "I"),
+        ("difficulty_codes", "B"),
+        ("scores", "B"),
+        ("title_starts", "Q"),
+        ("title_postings", "I"),
+    )
+
+    # The amount of exclusion bitsets kept per bank
+    EXCLUSION_CACHE_SIZE = 16
+
+    def __init__(self):
+        """
+        Initializes an empty bank.
+        """
+        self.texts = bytearray()
+        self.text_offsets = array("Q", [0])
+        self.urls = bytearray()
+        self.url_offsets = array("Q", [0])
+        self.title_codes = array("I")
+        self.difficulty_codes = array("B")
+        self.scores = array("B")
+        self.title_starts = array("Q", [0])
+        self.title_postings = array("I")
+        self.titles = []
+        self.__title_lookup = {}
+        self.__exclusion_masks = OrderedDict()
+        self.__difficulty_masks = None
+        self.generation = None
+        self.statistics = None
+        self.usage = None
+
+        # What the bank was read from, used to find out if it is stale and what was appended since
+        self.source_size = None
+        self.source_mtime_ns = None
+        self.source_offset = 0
+        self.source_checksum = ""
+        self.source_lines = 0
+        # The checksum of the file when it was last read whole, kept while rows are only appended,
+        # so row positions, as remembered by the exam history, mean the same question while it is unchanged
+        self.source_lineage = ""
+
+    def __len__(self) -> int:
+        """
+        Returns the amount of questions in the bank.
+        """
+        return len(self.scores)
+
+    def nbytes(self) -> int:
+        """
+        Returns the amount of bytes taken by the columns of the bank, in memory or mapped.
+        """
+        return sum(memoryview(getattr(self, name)).nbytes for name, _ in self.COLUMNS)
+
+    def copy(self):
+        """
+        Returns a writable in-memory copy of the bank, also of attached banks.
+
+        The columns are copied with a single memory copy each, without parsing anything.
+
+        Returns:
+            BANK: The copy.
+        """
+        bank = BANK()
+        for name, typecode in self.COLUMNS:
+            column = array(typecode)
+            column.frombytes(memoryview(getattr(self, name)).cast("B"))
+            setattr(bank, name, bytearray(column) if typecode == "B" and name in ("texts", "urls") else column)
+        for title in self.titles:
+            bank.__title_lookup[title] = len(bank.titles)
+            bank.titles.append(title)
+        for name in ("source_size", "source_mtime_ns", "source_offset", "source_checksum", "source_lines", "source_lineage"):
+            setattr(bank, name, getattr(self, name))
+        return bank
+
+    def matches(self, source: str) -> bool:
+        """
+        Checks if the bank was read from the current version of the CSV file.
+
+        Args:
+            source (str): The path of the CSV file.
+
+        Returns:
+            bool: True if the file has not changed since the bank was read, False otherwise.
+        """
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return False
+        return self.source_size == stat.st_size and self.source_mtime_ns == stat.st_mtime_ns
+
+    def title_code(self, title: str) -> int | None:
+        """
+        Returns the code of a title, None if no question of the bank uses it.
+
+        Args:
+            title (str): The title.
+
+        Returns:
+            int | None: The code of the title.
+        """
+        return self.__title_lookup.get(title)
+
+    def append(self, text: str, title: str, difficulty: str, score: int, url: str | None):
+        """
+        Adds a validated question to the end of the bank.
+
+        Args:
+            text (str): The question.
+            title (str): The question type.
+            difficulty (str): One of "Hard", "Medium" or "Easy".
+            score (int): The score of the question, between 0 and 100.
+            url (str | None): The URL of the question, if any.
+        """
+        code = self.__title_lookup.get(title)
+        if code is None:
+            code = len(self.titles)
+            self.titles.append(sys.intern(title))
+            self.__title_lookup[self.titles[code]] = code
+        self.texts += text.encode("utf-8")
+        self.text_offsets.append(len(self.texts))
+        self.urls += (url or "").encode("utf-8")
+        self.url_offsets.append(len(self.urls))
+        self.title_codes.append(code)
+        self.difficulty_codes.append(self.DIFFICULTY_CODES[difficulty])
+        self.scores.append(score)
+
+    def index_titles(self):
+        """
+        Brings the title index up-to-date with the rows of the bank.
+
+        The rows of title `code` are `title_postings[title_starts[code]:title_starts[code + 1]]`, in ascending order.
+        Rows appended since the index was last built are merged into it, the older rows are only copied.
+        """
+        indexed = len(self.title_postings)
+        if indexed == len(self) and len(self.title_starts) == len(self.titles) + 1:
+            return
+
+        appended = [[] for _ in self.titles]
+        for index in range(indexed, len(self)):
+            appended[self.title_codes[index]].append(index)
+
+        postings = array("I")
+        starts = array("Q", [0])
+        previous = memoryview(self.title_postings).cast("B")
+        for code in range(len(self.titles)):
+            if code + 1 < len(self.title_starts):
+                postings.frombytes(previous[self.title_starts[code] * 4:self.title_starts[code + 1] * 4])
+            postings.extend(appended[code])
+            starts.append(len(postings))
+        previous.release()
+        self.title_postings = postings
+        self.title_starts = starts
+
+    def exclusion_mask(self, titles) -> int:
+        """
+        Returns a bitset of the rows of the given titles.
+
+        The bitset is built from the title index, walking whichever is smaller of the excluded and the
+        included rows, and cached for the set of titles, so it costs the same no matter how many titles it has.
+
+        Args:
+            titles (Iterable[str]): The titles, the ones no question of the bank uses are ignored.
+
+        Returns:
+            int: The bitset.
+        """
+        key = frozenset(titles)
+        mask = self.__exclusion_masks.get(key)
+        if mask is not None:
+            self.__exclusion_masks.move_to_end(key)
+            return mask
+
+        self.index_titles()
+        codes = {self.__title_lookup[title] for title in key if title in self.__title_lookup}
+        excluded_rows = sum(self.title_starts[code + 1] - self.title_starts[code] for code in codes)
+        invert = excluded_rows > len(self) // 2
+        if invert:
+            codes = set(range(len(self.titles))) - codes
+        rows = (
+            index
+            for code in codes
+            for index in self.title_postings[self.title_starts[code]:self.title_starts[code + 1]]
+        )
+        mask = BITSET.from_indexes(rows, len(self))
+        if invert:
+            mask ^= BITSET.full(len(self))
+
+        self.__exclusion_masks[key] = mask
+        if len(self.__exclusion_masks) > self.EXCLUSION_CACHE_SIZE:
+            self.__exclusion_masks.popitem(last=False)
+        return mask
+
+    def difficulty_mask(self, difficulty: str) -> int:
+        """
+        Returns a bitset of the rows of a difficulty, the bitsets of every difficulty are built together on first use.
+
+        Args:
+            difficulty (str): One of "Hard", "Medium" or "Easy".
+
+        Returns:
+            int: The bitset.
+        """
+        if self.__difficulty_masks is None:
+            bits = [bytearray((len(self) + 7) // 8) for _ in self.DIFFICULTIES]
+            for index, code in enumerate(self.difficulty_codes):
+                bits[code][index >> 3] |= 1 << (index & 7)
+            self.__difficulty_masks = [int.from_bytes(data, "little") for data in bits]
+        return self.__difficulty_masks[self.DIFFICULTY_CODES[difficulty]]
+
+    def text(self, index: int) -> str:
+        """
+        Returns the question text at the given index.
+        """
+        return str(self.texts[self.text_offsets[index]:self.text_offsets[index + 1]], "utf-8")
+
+    def url(self, index: int) -> str | None:
+        """
+        Returns the URL of the question at the given index, None if it has none.
+        """
+        return str(self.urls[self.url_offsets[index]:self.url_offsets[index + 1]], "utf-8") or None
+
+    def title(self, index: int) -> str:
+        """
+        Returns the title of the question at the given index.
+        """
+        return self.titles[self.title_codes[index]]
+
+    def difficulty(self, index: int) -> str:
+        """
+        Returns the difficulty of the question at the given index.
+        """
+        return self.DIFFICULTIES[self.difficulty_codes[index]]
+
+    def row(self, index: int) -> list:
+        """
+        Returns the question at the given index in the CSV row layout [question, title, difficulty, score, url].
+
+        Args:
+            index (int): The index of the question.
+
+        Returns:
+            list: The question.
+        """
+        return [self.text(index), self.title(index), self.difficulty(index), self.scores[index], self.url(index)]
+
+    def publish(self, handle: str) -> bool:
+        """
+        Publishes the bank as a new generation of memory-mapped bank file.
+
+        The generation file is written completely before the handle is atomically replaced to point at it,
+        so attaching processes see either the previous generation or the new one.
+        The generations older than the one the handle pointed at are then removed, a concurrent publisher
+        may be about to point it at a newer one; processes that still map them keep their pages until they detach.
+
+        Args:
+            handle (str): The path of the handle file, for example "Data.bank".
+
+        Returns:
+            bool: True if the bank was published, False otherwise.
+        """
+        try:
+            self.index_titles()
+            generation = f"{time.time_ns():016x}{os.getpid():x}"
+            path = f"{handle}.{generation}"
+
+            # Lay the columns out one after the other, each aligned to 8 bytes
+            columns = {}
+            position = 0
+            for name, _ in self.COLUMNS:
+                data = memoryview(getattr(self, name)).cast("B")
+                position = (position + 7) // 8 * 8
+                columns[name] = [position, len(data)]
+                position += len(data)
+            header = json.dumps(
+                {"rows": len(self), "titles": self.titles, "columns": columns}
+            ).encode("utf-8")
+            start = (len(self.MAGIC) + 8 + len(header) + 7) // 8 * 8
+
+            with open(f"{path}.tmp", "wb") as file:
+                file.write(self.MAGIC + struct.pack("<Q", len(header)) + header)
+                for name, _ in self.COLUMNS:
+                    file.seek(start + columns[name][0])
+                    file.write(memoryview(getattr(self, name)).cast("B"))
+            os.replace(f"{path}.tmp", path)
+
+            # Remember the generation the handle points at, only older generations are removed
+            previous = None
+            try:
+                with open(handle) as file:
+                    previous = json.load(file)["generation"]
+            except (OSError, ValueError, KeyError):
+                pass
+
+            # Point the handle at the new generation
+            with open(f"{handle}.{os.getpid()}.tmp", "w") as file:
+                json.dump(
+                    {
+                        "generation": generation,
+                        "path": os.path.basename(path),
+                        "data_start": start,
+                        "source_size": self.source_size,
+                        "source_mtime_ns": self.source_mtime_ns,
+                        "source_offset": self.source_offset,
+                        "source_checksum": self.source_checksum,
+                        "source_lines": self.source_lines,
+                        "source_lineage": self.source_lineage,
+                    },
+                    file,
+                )
+            os.replace(f"{handle}.{os.getpid()}.tmp", handle)
+            self.generation = generation
+
+            # Remove the generations older than the previous one, generations sort by the time they were started,
+            # files still mapped elsewhere may not be removable on Windows
+            directory = os.path.dirname(handle) or "."
+            prefix = f"{os.path.basename(handle)}."
+            for name in os.listdir(directory):
+                if (
+                        previous is not None
+                        and name.startswith(prefix)
+                        and not name.endswith(".tmp")
+                        and name[len(prefix):] < previous
+                ):
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError:
+                        pass
+
+            log.info(f"Published question bank generation {generation} with {len(self)} questions")
+            return True
+        except Exception as e:
+            log.error(f"An error occurred while publishing the question bank. as {e}")
+            return False
+
+    @staticmethod
+    def attach(handle: str):
+        """
+        Attaches read-only to the published bank generation the handle points at.
+
+        Use `matches` to check if the attached bank is still up-to-date with its CSV file.
+
+        Args:
+            handle (str): The path of the handle file, for example "Data.bank".
+
+        Returns:
+            BANK: The attached bank.
+            None: If no bank is published.
+        """
+        try:
+            if not os.path.exists(handle):
+                return None
+            with open(handle) as file:
+                pointer = json.load(file)
+
+            path = os.path.join(os.path.dirname(handle), pointer["path"])
+            with open(path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            if mapped[:len(BANK.MAGIC)] != BANK.MAGIC:
+                raise ValueError(f"Corrupted question bank file: {path}")
+            header_length = struct.unpack_from("<Q", mapped, len(BANK.MAGIC))[0]
+            header = json.loads(mapped[len(BANK.MAGIC) + 8:len(BANK.MAGIC) + 8 + header_length])
+
+            # Point every column at its pages of the mapping, nothing is copied
+            bank = BANK()
+            view = memoryview(mapped)
+            start = pointer["data_start"]
+            for name, typecode in BANK.COLUMNS:
+                offset, length = header["columns"][name]
+                setattr(bank, name, view[start + offset:start + offset + length].cast(typecode))
+            for title in header["titles"]:
+                bank.titles.append(sys.intern(title))
+                bank.__title_lookup[bank.titles[-1]] = len(bank.titles) - 1
+            bank.generation = pointer["generation"]
+            for name in ("source_size", "source_mtime_ns", "source_offset", "source_checksum", "source_lines", "source_lineage"):
+                setattr(bank, name, pointer[name])
+            colorlog.debug(f"Attached to question bank generation {bank.generation}")
+            return bank
+        except Exception as e:
+            log.warning(f"Could not attach to the published question bank. as {e}")
+            return None
+
+
+class BANK_MANAGER:
+    """
+    Keeps the question bank of a long-running process up-to-date without restarting it.
+
+    A background thread watches the CSV file, builds and validates the new bank when it changes,
+    and then swaps it in with a single reference assignment. Generations take a snapshot when they start
+    and finish on it, an old snapshot is freed as soon as the last generation using it lets it go.
+    """
+
+    def __init__(self, loader, source="Data.csv", interval=1.0):
+        """
+        Initializes the bank manager.
+
+        Args:
+            loader (Callable[[], BANK | bool]): Builds a bank from the CSV file, returns False on failure.
+            source (str, optional): The path of the CSV file to watch. Defaults to "Data.csv".
+            interval (float, optional): Seconds between checks of the CSV file. Defaults to 1.0.
+        """
+        self.source = source
+        self.interval = interval
+        self.version = 0
+        self.__loader = loader
+        self.__current = None
+        self.__stat = None
+        self.__stopped = threading.Event()
+
+    def __source_stat(self) -> tuple[int, int] | None:
+        """
+        Returns the size and modification time of the CSV file, None if it does not exist.
+        """
+        try:
+            stat = os.stat(self.source)
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    def start(self) -> bool:
+        """
+        Loads the first bank and starts watching the CSV file.
+
+        Returns:
+            bool: True if the first bank was loaded, False otherwise.
+        """
+        self.__stat = self.__source_stat()
+        bank = self.__loader()
+        if bank is False:
+            return False
+        self.__current = bank
+        self.version = 1
+        threading.Thread(target=self.__watch, name="bank-watcher", daemon=True).start()
+        return True
+
+    def snapshot(self) -> BANK:
+        """
+        Returns the current bank, it stays valid for the caller even after a newer bank is swapped in.
+        """
+        return self.__current
+
+    def stop(self):
+        """
+        Stops watching the CSV file, snapshots already taken stay valid.
+        """
+        self.__stopped.set()
+
+    def __watch(self):
+        """
+        Rebuilds the bank whenever the CSV file changes, runs on the watcher thread.
+        """
+        while not self.__stopped.wait(self.interval):
+            stat = self.__source_stat()
+            if stat is None or stat == self.__stat:
+                continue
+
+            # Remember the state before loading, so a write during the load triggers another rebuild
+            self.__stat = stat
+            log.info(f"{self.source} changed, building a new question bank in the background")
+            bank = self.__loader()
+            if bank is False:
+                log.error(f"Keeping question bank version {self.version}, the new {self.source} is invalid")
+                continue
+
+            self.__current = bank
+            self.version += 1
+            log.info(f"Swapped in question bank version {self.version} with {len(bank)} questions")
+
+
+class BANK_REGISTRY:
+    """
+    Keeps the question banks of many subjects in one long-running process.
+
+    Every subject has its own directory under 'Subjects/' holding its 'Data.csv',
+    the default subject "" is the 'Data.csv' of the working directory.
+    A subject's bank is only loaded, and then watched by its own bank manager, on its first request.
+    Once the loaded banks take more memory than the limit, the least recently used subjects are dropped.
+    """
+
+    ROOT = "Subjects"
+    # The names the CSV file of a subject may have, in order of preference, compressed ones are read as they are
+    SOURCES = ("Data.csv", "Data.csv.gz", "Data.csv.bz2", "Data.csv.xz")
+
+    def __init__(self, loader, memory_limit=1 << 30, interval=1.0):
+        """
+        Initializes an empty registry.
+
+        Args:
+            loader (Callable[[str], BANK | bool]): Builds the bank of a subject, returns False on failure.
+            memory_limit (int, optional): Bytes the loaded banks may take together. Defaults to 1 GiB.
+            interval (float, optional): Seconds between checks of each CSV file. Defaults to 1.0.
+        """
+        self.memory_limit = memory_limit
+        self.interval = interval
+        self.__loader = loader
+        self.__managers = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def path(subject: str, name: str) -> str:
+        """
+        Returns the path of a file of a subject, for example `path("Maths", "Data.csv")`.
+        """
+        if not subject:
+            return name
+        return os.path.join(BANK_REGISTRY.ROOT, subject, name)
+
+    @staticmethod
+    def source(subject: str) -> str:
+        """
+        Returns the path of the CSV file of a subject, the first of `SOURCES` that exists ('Data.csv' if none does).
+        """
+        for name in BANK_REGISTRY.SOURCES:
+            path = BANK_REGISTRY.path(subject, name)
+            if os.path.exists(path):
+                return path
+        return BANK_REGISTRY.path(subject, "Data.csv")
+
+    @staticmethod
+    def exists(subject: str) -> bool:
+        """
+        Returns True if the subject is the default subject or has a directory.
+        """
+        return not subject or os.path.isdir(os.path.join(BANK_REGISTRY.ROOT, subject))
+
+    def snapshot(self, subject: str) -> BANK | bool:
+        """
+        Returns the current bank of a subject, loading it first if it is not loaded.
+
+        Args:
+            subject (str): The subject of the bank.
+
+        Returns:
+            BANK: The bank of questions.
+            bool: False if the bank could not be loaded.
+        """
+        with self.__lock:
+            manager = self.__managers.get(subject)
+            if manager is None:
+                log.info(f"Loading the question bank of subject '{subject}'")
+                manager = BANK_MANAGER(
+                    lambda: self.__loader(subject), self.source(subject), self.interval
+                )
+                if not manager.start():
+                    return False
+                self.__managers[subject] = manager
+            self.__managers.move_to_end(subject)
+            self.__evict()
+            return manager.snapshot()
+
+    def __evict(self):
+        """
+        Drops the least recently used subjects until the loaded banks fit in the memory limit.
+
+        The most recently used subject is always kept, even if its bank alone is over the limit.
+        """
+        used = sum(manager.snapshot().nbytes() for manager in self.__managers.values())
+        while used > self.memory_limit and len(self.__managers) > 1:
+            subject, manager = self.__managers.popitem(last=False)
+            manager.stop()
+            used -= manager.snapshot().nbytes()
+            log.info(f"Unloaded the question bank of subject '{subject}', {used} bytes of banks still loaded")
+
+
+class CHECKSUM_READER(io.RawIOBase):
+    """
+    A binary file that hashes and counts every byte read from it.
+
+    The CSV loader reads its file through it, so the checksum of the file comes with the single pass
+    that parses it, and compressed files are hashed as they are stored while they are decompressed.
+    """
+
+    # The magic bytes of the compressed formats the CSV file may be stored in, and how to decompress each one
+    FORMATS = (
+        (b"\x1f\x8b", lambda stored: gzip.GzipFile(fileobj=stored)),
+        (b"BZh", bz2.BZ2File),
+        (b"\xfd7zXZ\x00", lzma.LZMAFile),
+    )
+
+    def __init__(self, path: str):
+        """
+        Opens a file.
+
+        Args:
+            path (str): The path of the file.
+        """
+        super().__init__()
+        self.file = open(path, "rb")
+        self.checksum = hashlib.blake2b()
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = self.file.readinto(buffer)
+        if size:
+            self.checksum.update(memoryview(buffer)[:size])
+            self.bytes_read += size
+        return size
+
+    def drain(self):
+        """
+        Reads the rest of the file, so the checksum covers all of it.
+        """
+        while self.read(1 << 20):
+            pass
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+    @staticmethod
+    def open_text(path: str) -> tuple[io.TextIOWrapper, "CHECKSUM_READER"]:
+        """
+        Opens a UTF-8 text file, decompressing it on the fly if it is stored as gzip, bzip2 or xz.
+
+        The format is told by the magic bytes of the file, whatever its extension,
+        and nothing is unpacked to disk: the text is decompressed as it is read.
+        Closing the text does not close a compressed file, the caller closes the returned reader.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            tuple[io.TextIOWrapper, CHECKSUM_READER]: The text, and the reader of the stored bytes.
+        """
+        raw = CHECKSUM_READER(path)
+        stored = io.BufferedReader(raw, 1 << 20)
+        try:
+            magic = stored.peek(6)[:6]
+        except OSError:
+            raw.close()
+            raise
+        for prefix, decompressor in CHECKSUM_READER.FORMATS:
+            if magic.startswith(prefix):
+                return io.TextIOWrapper(decompressor(stored), encoding="utf-8"), raw
+        return io.TextIOWrapper(stored, encoding="utf-8"), raw
+
+    @staticmethod
+    def compressed(path: str) -> bool:
+        """
+        Returns True if the file is stored in one of the compressed formats.
+        """
+        with open(path, "rb") as file:
+            magic = file.read(6)
+        return any(magic.startswith(prefix) for prefix, _ in CHECKSUM_READER.FORMATS)
+
+
+class STATISTICS:
+    """
+    Precomputed statistics of a question bank, used to tell if a configuration can be met without generating an exam.
+
+    Keeps the score histogram of every (difficulty, title) pair, from which the question counts and the
+    per-difficulty score histograms follow, and, for every difficulty, the point totals reachable with each
+    amount of its questions up to `REACHABLE_LIMIT`, as bitsets where bit `p` is set if `p` points can be reached.
+    """
+
+    MAGIC = "EGSTAT01"
+    REACHABLE_LIMIT = 40
+
+    def __init__(self, histograms: dict[str, dict[str, dict[int, int]]], reachable: dict[str, list[int]],
+                 generation: str = None):
+        """
+        Initializes the statistics.
+
+        Args:
+            histograms (dict): The score histograms, as {difficulty: {title: {score: amount of questions}}}.
+            reachable (dict): The reachable point totals, as {difficulty: [bitset for 0, 1, 2... questions]}.
+            generation (str, optional): The generation of the bank they were built from. Defaults to None.
+        """
+        self.histograms = histograms
+        self.reachable = reachable
+        self.generation = generation
+
+    def counts(self) -> dict[str, dict[str, int]]:
+        """
+        Returns the amount of questions of every (difficulty, title) pair, as {difficulty: {title: amount}}.
+        """
+        return {
+            difficulty: {title: sum(histogram.values()) for title, histogram in titles.items()}
+            for difficulty, titles in self.histograms.items()
+        }
+
+    def score_histogram(self, difficulty: str, excluded_titles=frozenset()) -> dict[int, int]:
+        """
+        Returns the score histogram of a difficulty, as {score: amount of questions}.
+
+        Args:
+            difficulty (str): The difficulty of the questions.
+            excluded_titles (set[str], optional): Titles whose questions are left out. Defaults to none.
+        """
+        merged = {}
+        for title, histogram in self.histograms[difficulty].items():
+            if title in excluded_titles:
+                continue
+            for score, amount in histogram.items():
+                merged[score] = merged.get(score, 0) + amount
+        return merged
+
+    @staticmethod
+    def reachable_totals(histogram: dict[int, int], limit: int) -> list[int]:
+        """
+        Computes the point totals reachable by picking exactly 0, 1, 2... `limit` questions out of a score histogram.
+
+        The copies of a score are split into bundles of 1, 2, 4... questions, which add up to any amount of them,
+        so the cost grows with the logarithm of the amount of questions instead of the amount itself.
+
+        Args:
+            histogram (dict[int, int]): The score histogram, as {score: amount of questions}.
+            limit (int): The largest amount of questions to pick.
+
+        Returns:
+            list[int]: A bitset of the reachable totals for every amount of questions from 0 to `limit`.
+        """
+        reachable = [1] + [0] * limit
+        for score, amount in histogram.items():
+            amount = min(amount, limit)
+            bundle = 1
+            while amount > 0:
+                size = min(bundle, amount)
+                amount -= size
+                bundle *= 2
+                for picked in range(limit, size - 1, -1):
+                    if reachable[picked - size]:
+                        reachable[picked] |= reachable[picked - size] << score * size
+        return reachable
+
+    @staticmethod
+    def build(bank: BANK):
+        """
+        Builds the statistics of a bank.
+
+        Args:
+            bank (BANK): The bank of questions.
+
+        Returns:
+            STATISTICS: The statistics of the bank.
+        """
+        histograms = {difficulty: {} for difficulty in BANK.DIFFICULTIES}
+        for (difficulty_code, title_code, score), amount in Counter(
+                zip(bank.difficulty_codes, bank.title_codes, bank.scores)
+        ).items():
+            histograms[BANK.DIFFICULTIES[difficulty_code]].setdefault(bank.titles[title_code], {})[score] = amount
+
+        statistics = STATISTICS(histograms, {}, bank.generation)
+        for difficulty in BANK.DIFFICULTIES:
+            statistics.reachable[difficulty] = STATISTICS.reachable_totals(
+                statistics.score_histogram(difficulty), STATISTICS.REACHABLE_LIMIT
+            )
+        return statistics
+
+    def save(self, path: str) -> bool:
+        """
+        Saves the statistics next to the bank, atomically replacing the previous ones.
+
+        Args:
+            path (str): The path of the statistics file, for example "Data.stats".
+
+        Returns:
+            bool: True if the statistics were saved, False otherwise.
+        """
+        try:
+            with open(f"{path}.tmp", "w") as file:
+                json.dump(
+                    {
+                        "magic": self.MAGIC,
+                        "generation": self.generation,
+                        "histograms": self.histograms,
+                        "reachable": {
+                            difficulty: [f"{bitset:x}" for bitset in bitsets]
+                            for difficulty, bitsets in self.reachable.items()
+                        },
+                    },
+                    file,
+                )
+            os.replace(f"{path}.tmp", path)
+            return True
+        except Exception as e:
+            log.warning(f"Could not save the question bank statistics. as {e}")
+            return False
+
+    @staticmethod
+    def load(path: str, generation: str):
+        """
+        Loads the statistics saved for a bank generation.
+
+        Args:
+            path (str): The path of the statistics file, for example "Data.stats".
+            generation (str): The generation of the bank the statistics must be of.
+
+        Returns:
+            STATISTICS: The statistics of the bank.
+            None: If no statistics of that generation were saved.
+        """
+        try:
+            if not os.path.exists(path):
+                return None
+            with open(path) as file:
+                saved = json.load(file)
+            if saved["magic"] != STATISTICS.MAGIC or saved["generation"] != generation:
+                return None
+            return STATISTICS(
+                {
+                    difficulty: {
+                        title: {int(score): amount for score, amount in histogram.items()}
+                        for title, histogram in titles.items()
+                    }
+                    for difficulty, titles in saved["histograms"].items()
+                },
+                {
+                    difficulty: [int(bitset, 16) for bitset in bitsets]
+                    for difficulty, bitsets in saved["reachable"].items()
+                },
+                generation,
+            )
+        except Exception as e:
+            log.warning(f"Could not load the question bank statistics. as {e}")
+            return None
+
+    def feasibility(self, amounts: dict[str, int], minimum_titles: int, total_points: int,
+                    excluded_titles: set[str]) -> dict:
+        """
+        Checks if an exam configuration violates a rule the question bank can never meet, without generating anything.
+
+        Every rule is checked on its own: the amount of questions per difficulty, the amount of distinct titles
+        (a maximum matching of titles to the questions of each difficulty), and the exact point total.
+        These are necessary conditions only: a violated rule proves the exam impossible, but a configuration
+        that violates none may still be impossible when the rules are combined.
+
+        Args:
+            amounts (dict[str, int]): The amount of questions of every difficulty.
+            minimum_titles (int): The minimum amount of distinct titles.
+            total_points (int): The exact point total.
+            excluded_titles (set[str]): Titles whose questions may not be used.
+
+        Returns:
+            dict: "no_rule_violated", the "problems" found, the questions "available" per difficulty,
+            the "maximum_titles" an exam can have and the "reachable_points" range.
+        """
+        problems = []
+        histograms = {
+            difficulty: self.score_histogram(difficulty, excluded_titles) for difficulty in BANK.DIFFICULTIES
+        }
+        available = {difficulty: sum(histogram.values()) for difficulty, histogram in histograms.items()}
+        for difficulty in BANK.DIFFICULTIES:
+            if available[difficulty] < amounts[difficulty]:
+                problems.append(
+                    f"Only {available[difficulty]} {difficulty} questions are available, "
+                    f"{amounts[difficulty]} are requested"
+                )
+
+        # The most titles an exam can have is a minimum cut: for every set of difficulties,
+        # all of their slots, plus the titles that also have questions of other difficulties
+        title_difficulties = {}
+        for difficulty in BANK.DIFFICULTIES:
+            for title in self.histograms[difficulty]:
+                if title not in excluded_titles:
+                    title_difficulties.setdefault(title, set()).add(difficulty)
+        maximum_titles = None
+        for chosen in range(1 << len(BANK.DIFFICULTIES)):
+            cut = {difficulty for code, difficulty in enumerate(BANK.DIFFICULTIES) if chosen >> code & 1}
+            size = sum(amounts[difficulty] for difficulty in cut) + sum(
+                1 for difficulties in title_difficulties.values() if not difficulties <= cut
+            )
+            maximum_titles = size if maximum_titles is None else min(maximum_titles, size)
+        if maximum_titles < minimum_titles:
+            problems.append(
+                f"At most {maximum_titles} distinct titles can be used, {minimum_titles} are requested"
+            )
+
+        # Add up the reachable totals of every difficulty, using the precomputed ones when nothing is excluded
+        reachable_points = None
+        if not any(available[difficulty] < amounts[difficulty] for difficulty in BANK.DIFFICULTIES):
+            totals = 1
+            for difficulty in BANK.DIFFICULTIES:
+                amount = amounts[difficulty]
+                if not excluded_titles and amount <= self.REACHABLE_LIMIT:
+                    reachable = self.reachable[difficulty][amount]
+                else:
+                    reachable = self.reachable_totals(histograms[difficulty], amount)[amount]
+                combined = 0
+                while reachable:
+                    lowest = reachable & -reachable
+                    combined |= totals << lowest.bit_length() - 1
+                    reachable ^= lowest
+                totals = combined
+            reachable_points = [(totals & -totals).bit_length() - 1, totals.bit_length() - 1]
+            if not totals >> total_points & 1:
+                problems.append(
+                    f"A total of {total_points} points cannot be reached, "
+                    f"totals from {reachable_points[0]} to {reachable_points[1]} points can be"
+                )
+
+        return {
+            "no_rule_violated": not problems,
+            "problems": problems,
+            "available": available,
+            "maximum_titles": maximum_titles,
+            "reachable_points": reachable_points,
+        }
+
+
+class USAGE:
+    """
+    Counts how often every question of a bank was used, and draws questions weighted toward the least used ones.
+
+    A question used `u` times has the weight `1 / (1 + u)`. The weights of every difficulty are kept in a Fenwick tree,
+    so a weighted draw is a single O(log n) descent and recording a used question is a single O(log n) update,
+    even with millions of questions. The counts are shared by every process through 'Usage.db', next to the bank:
+    every recorded exam stamps its rows with the next sequence number, and `refresh` applies the rows stamped
+    by other processes since the last one, so long-running workers balance each other's draws too.
+    """
+
+    def __init__(self, bank: BANK, path: str):
+        """
+        Loads the counts of a bank and builds the trees of its weights.
+
+        Args:
+            bank (BANK): The bank of questions.
+            path (str): The path of the database of the counts.
+        """
+        self.path = path
+        self.counts = array("I", bytes(4 * len(bank)))
+        # The highest sequence number applied to the counts
+        self.sequence = 0
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS Usage (
+                                question INTEGER PRIMARY KEY,
+                                uses INTEGER NOT NULL,
+                                sequence INTEGER NOT NULL DEFAULT 0);"""
+            )
+            # Add the sequence column to counts made before it existed
+            if "sequence" not in [column[1] for column in conn.execute("""PRAGMA table_info(Usage)""")]:
+                conn.execute("""ALTER TABLE Usage ADD COLUMN sequence INTEGER NOT NULL DEFAULT 0""")
+            conn.execute("""CREATE INDEX IF NOT EXISTS Usage_sequence ON Usage (sequence);""")
+            conn.commit()
+            for question, uses, sequence in conn.execute(
+                    """SELECT question, uses, sequence FROM Usage WHERE question < ?""", (len(bank),)
+            ):
+                self.counts[question] = uses
+                self.sequence = max(self.sequence, sequence)
+        finally:
+            conn.close()
+
+        # Every difficulty has its own tree over its questions, in index order
+        self.__buckets = {}
+        self.__trees = {}
+        self.__totals = {}
+        for difficulty in BANK.DIFFICULTIES:
+            bucket = array("I", BITSET.to_indexes(bank.difficulty_mask(difficulty)))
+            tree = array("d", [0.0])
+            tree.extend(1 / (1 + self.counts[index]) for index in bucket)
+            for position in range(1, len(tree)):
+                parent = position + (position & -position)
+                if parent < len(tree):
+                    tree[parent] += tree[position]
+            self.__buckets[difficulty] = bucket
+            self.__trees[difficulty] = tree
+            self.__totals[difficulty] = sum(1 / (1 + self.counts[index]) for index in bucket)
+
+    def __find(self, difficulty: str, value: float) -> int:
+        """
+        Returns the question whose weight covers `value` in the running total of the weights of a difficulty.
+        """
+        tree = self.__trees[difficulty]
+        position = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            following = position + step
+            if following < len(tree) and tree[following] <= value:
+                position = following
+                value -= tree[following]
+            step >>= 1
+        bucket = self.__buckets[difficulty]
+        return bucket[min(position, len(bucket) - 1)]
+
+    def sampler(self, difficulty: str, candidates: list[int], eligible: bytes):
+        """
+        Returns a function drawing distinct candidates of a difficulty, weighted toward the least used ones.
+
+        While most questions of the difficulty are candidates, draws come from the tree and the questions that are
+        not candidates are drawn again. Otherwise, the running total of the weights of the candidates is built once,
+        and draws are a binary search in it.
+
+        Args:
+            difficulty (str): The difficulty of the candidates.
+            candidates (list[int]): The indexes of the questions that may be drawn.
+            eligible (bytes): The candidates as little endian bitset bytes.
+
+        Returns:
+            Callable[[int], list[int]]: Draws the given amount of distinct candidates, all of them if there are fewer.
+        """
+        if len(candidates) * 4 >= len(self.__buckets[difficulty]):
+            def draw_one():
+                return self.__find(difficulty, random.random() * self.__totals[difficulty])
+
+            def accept(index):
+                return index >> 3 < len(eligible) and eligible[index >> 3] >> (index & 7) & 1
+        else:
+            running_total = list(accumulate(1 / (1 + self.counts[index]) for index in candidates))
+
+            def draw_one():
+                return candidates[bisect.bisect_right(running_total, random.random() * running_total[-1])]
+
+            def accept(index):
+                return True
+
+        def draw(amount: int) -> list[int]:
+            if amount >= len(candidates):
+                return random.sample(candidates, len(candidates))
+            picks = {}
+            while len(picks) < amount:
+                index = draw_one()
+                if index not in picks and accept(index):
+                    picks[index] = None
+            return list(picks)
+
+        return draw
+
+    def __set(self, index: int, difficulty: str, uses: int):
+        """
+        Sets the count of a question, updating the weights of its tree.
+        """
+        delta = 1 / (1 + uses) - 1 / (1 + self.counts[index])
+        self.counts[index] = uses
+        self.__totals[difficulty] += delta
+        tree = self.__trees[difficulty]
+        # The buckets are sorted, so the position of a question in its tree is a binary search away
+        position = bisect.bisect_left(self.__buckets[difficulty], index) + 1
+        while position < len(tree):
+            tree[position] += delta
+            position += position & -position
+
+    def refresh(self, bank: BANK):
+        """
+        Applies the counts other processes recorded in 'Usage.db' since the last refresh, a single indexed query.
+
+        Args:
+            bank (BANK): The bank of the questions.
+        """
+        try:
+            conn = sqlite3.connect(self.path, timeout=30)
+            try:
+                for question, uses, sequence in conn.execute(
+                        """SELECT question, uses, sequence FROM Usage WHERE sequence > ? AND question < ?""",
+                        (self.sequence, len(self.counts)),
+                ):
+                    if uses != self.counts[question]:
+                        self.__set(question, bank.difficulty(question), uses)
+                    self.sequence = max(self.sequence, sequence)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            log.warning(f"Could not refresh the usage of the questions. as {e}")
+
+    def record(self, indexes: list[int], bank: BANK):
+        """
+        Counts a use of every question of an exam, in the trees and in 'Usage.db'.
+
+        Args:
+            indexes (list[int]): The indexes of the questions of the exam.
+            bank (BANK): The bank of the questions.
+        """
+        for index in indexes:
+            self.__set(index, bank.difficulty(index), self.counts[index] + 1)
+
+        try:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            try:
+                # Stamp the rows with the next sequence number, in one write transaction so numbers never repeat
+                conn.execute("BEGIN IMMEDIATE")
+                sequence = conn.execute("""SELECT COALESCE(MAX(sequence), 0) + 1 FROM Usage""").fetchone()[0]
+                conn.executemany(
+                    """INSERT INTO Usage (question, uses, sequence) VALUES (?, 1, ?)
+                       ON CONFLICT(question) DO UPDATE SET uses = uses + 1, sequence = excluded.sequence""",
+                    ((index, sequence) for index in indexes),
+                )
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # The counts only steer future draws, an exam must not fail because of them
+            log.warning(f"Could not record the usage of the questions. as {e}")
+
+
+class QUESTIONS:
+    """
+    A question bank imported into SQLite.
+
+    Questions are stored with their rank inside their difficulty ('position'), so a request samples
+    random positions through an index and only ever reads the rows it picks, title exclusions included.
+    Per-request memory then depends on the size of the exam and not on the size of the bank.
+    Question `i` of the bank has the id `i + 1`, the same numbering as the CSV bank,
+    and the lineage of the CSV bank is kept with it, banks imported by older versions have none.
+    """
+
+    # The most positions looked up by a single query, older SQLite builds allow at most 999 parameters
+    POSITIONS_PER_QUERY = 900
+
+    def __init__(self, database_name="Questions.db"):
+        """
+        Opens an imported question bank read-only.
+
+        Args:
+            database_name (str, optional): The name of the database. Defaults to "Questions.db".
+        """
+        self.db_name = database_name
+        self.conn = sqlite3.connect(f"file:{database_name}?mode=ro", uri=True)
+        self.counts = dict(self.conn.execute("SELECT difficulty, amount FROM Buckets"))
+        try:
+            self.source_lineage = self.conn.execute("SELECT lineage FROM Source").fetchone()[0]
+        except sqlite3.OperationalError:
+            self.source_lineage = ""
+
+    def __len__(self) -> int:
+        """
+        Returns the amount of questions in the bank.
+        """
+        return sum(self.counts.values())
+
+    def close(self):
+        """
+        Closes the connection to the database.
+        """
+        self.conn.close()
+
+    def row(self, index: int) -> list:
+        """
+        Returns the question at the given index in the CSV row layout [question, title, difficulty, score, url].
+
+        Args:
+            index (int): The index of the question.
+
+        Returns:
+            list: The question.
+        """
+        return list(
+            self.conn.execute(
+                "SELECT question, type, difficulty, score, url FROM Questions WHERE id=?",
+                (index + 1,),
+            ).fetchone()
+        )
+
+    def sample(self, difficulty: str, amount: int, excluded_titles: set[str], seen_mask: int,
+               max_score: int) -> list[tuple[int, str, int]]:
+        """
+        Picks random questions of a difficulty, uniformly among the ones that are not excluded.
+
+        Random positions are looked up through the (difficulty, position) index with the exclusions applied by SQLite,
+        if most of the difficulty is excluded the remaining questions are picked by SQLite directly.
+
+        Args:
+            difficulty (str): The difficulty of the questions.
+            amount (int): The amount of questions to pick.
+            excluded_titles (set[str]): The titles to exclude.
+            seen_mask (int): A bitset of question indexes to exclude.
+            max_score (int): The highest score a picked question may have.
+
+        Returns:
+            list[tuple[int, str, int]]: The index, title and score of each picked question,
+            fewer than `amount` if not enough questions are left.
+        """
+        count = self.counts.get(difficulty, 0)
+        # Test the recently seen questions on bytes, shifting the whole bitset costs as much as the bank is large
+        seen = BITSET.to_bytes(seen_mask)
+
+        def unseen(question_id):
+            index = question_id - 1
+            return index >> 3 >= len(seen) or not seen[index >> 3] >> (index & 7) & 1
+
+        titles = list(excluded_titles)
+        title_filter = f"AND type NOT IN ({','.join('?' * len(titles))})" if titles else ""
+        chosen = []
+        chosen_ids = set()
+        tried = set()
+
+        # Look up a few random positions at a time, rejecting the excluded ones
+        for _ in range(8):
+            need = amount - len(chosen)
+            if not need or len(tried) >= count:
+                break
+            positions = [
+                position
+                for position in random.sample(range(count), min(count, need * 4 + 8))
+                if position not in tried
+            ]
+            tried.update(positions)
+            by_position = {}
+            # Look the positions up in batches that stay below the SQLite limit on parameters
+            for start in range(0, len(positions), self.POSITIONS_PER_QUERY):
+                batch = positions[start:start + self.POSITIONS_PER_QUERY]
+                rows = self.conn.execute(
+                    f"""SELECT position, id, type, score FROM Questions
+                        WHERE difficulty=? AND position IN ({','.join('?' * len(batch))})
+                        {title_filter} AND score <= ?""",
+                    (difficulty, *batch, *titles, max_score),
+                ).fetchall()
+                by_position.update((row[0], row[1:]) for row in rows)
+            for position in positions:
+                row = by_position.get(position)
+                if row and unseen(row[0]) and len(chosen) < amount:
+                    chosen.append((row[0] - 1, row[1], row[2]))
+                    chosen_ids.add(row[0])
+
+        # Let SQLite pick among the questions that are left, when most of them are excluded
+        if len(chosen) < amount:
+            rows = self.conn.execute(
+                f"""SELECT id, type, score FROM Questions
+                    WHERE difficulty=? {title_filter} AND score <= ?
+                    ORDER BY RANDOM() LIMIT ?""",
+                (difficulty, *titles, max_score, amount + len(chosen_ids) + seen_mask.bit_count()),
+            ).fetchall()
+            for row in rows:
+                if row[0] not in chosen_ids and unseen(row[0]) and len(chosen) < amount:
+                    chosen.append((row[0] - 1, row[1], row[2]))
+                    chosen_ids.add(row[0])
+        return chosen
+
+    @staticmethod
+    def import_bank(bank: BANK, database_name="Questions.db") -> bool:
+        """
+        Imports a validated question bank into a new SQLite database, replacing the previous one atomically.
+
+        Args:
+            bank (BANK): The bank to import.
+            database_name (str, optional): The name of the database. Defaults to "Questions.db".
+
+        Returns:
+            bool: True if the bank was imported, False otherwise.
+        """
+        try:
+            log.info(f"Importing {len(bank)} questions into {database_name}")
+            temporary = f"{database_name}.tmp"
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            conn = sqlite3.connect(temporary)
+            cursor = conn.cursor()
+            cursor.execute(
+                """CREATE TABLE Questions (
+                                id INTEGER PRIMARY KEY,
+                                question TEXT NOT NULL,
+                                type TEXT NOT NULL,
+                                difficulty TEXT NOT NULL,
+                                score INTEGER NOT NULL,
+                                url TEXT,
+                                position INTEGER NOT NULL);"""
+            )
+            cursor.execute(
+                """CREATE TABLE Buckets (
+                                difficulty TEXT PRIMARY KEY,
+                                amount INTEGER NOT NULL);"""
+            )
+            cursor.execute("""CREATE TABLE Source (lineage TEXT NOT NULL);""")
+            cursor.execute("INSERT INTO Source VALUES (?)", (bank.source_lineage,))
+
+            # Number the questions of every difficulty from 0, so random positions can be looked up
+            positions = {difficulty: 0 for difficulty in BANK.DIFFICULTIES}
+
+            def rows():
+                for index in range(len(bank)):
+                    difficulty = bank.difficulty(index)
+                    yield (
+                        index + 1, bank.text(index), bank.title(index), difficulty,
+                        bank.scores[index], bank.url(index), positions[difficulty],
+                    )
+                    positions[difficulty] += 1
+
+            cursor.executemany("INSERT INTO Questions VALUES (?,?,?,?,?,?,?)", rows())
+            cursor.executemany("INSERT INTO Buckets VALUES (?,?)", positions.items())
+
+            # Create the indexes after inserting, which is much faster than maintaining them
+            cursor.execute("CREATE INDEX Questions_candidates ON Questions (difficulty, type, score);")
+            cursor.execute("CREATE UNIQUE INDEX Questions_position ON Questions (difficulty, position);")
+            conn.commit()
+            conn.close()
+            os.replace(temporary, database_name)
+
+            log.info(f"Imported {len(bank)} questions into {database_name}")
+            return True
+        except Exception as e:
+            log.error(f"An error occurred while importing the question bank. as {e}")
+            return False
+
+
+class DATABASE:
+    # The exam generation rate limit of every user, a burst of tokens refilled every minute (0 disables it)
+    REC_BURST = 20
+    REC_PER_MINUTE = 10
+
+    def __init__(self):
+        """
+        Initializes the database.
+
+        This method checks if the "users.db" file exists. If it doesn't, it logs a message and creates
+        the database using the `sql.create_db()` function.
+
+        It also checks if the "cat" and ".core/.ps1" files exist. If any of them are missing, it exits
+        the program with an error message.
+
+        Additionally, it checks if the size of the ".core/.ps1", "cat", and ".core/.py" files is zero.
+        If any of them are empty, it exits the program with an error message.
+
+        Finally, it logs a success message.
+
+        Returns:
+            None
+        """
+        if not os.path.exists(sql.db_name):
+            colorlog.debug("Creating user database from scratch using SQLite")
+            sql.create_db()
+        self.rate_limited = 0
+        self.pipeline = None
+        self.__output_sql = None
+        log.info("Database loaded successfully.")
+
+    @staticmethod
+    def __error(error):
+        """
+        Records an error code for the front end.
+
+        Requests with an id record it in their status manifest,
+        requests without one write it to the shared 'ERROR.temp' file.
+
+        Returns:
+            None
+        """
+        if REQUEST_STATUS is not None:
+            REQUEST_STATUS.code = error
+            return
+        if os.path.exists("ERROR.temp"):
             os.remove("ERROR.temp")
         with open("ERROR.temp", "w") as f:
             f.write(error)
 
     @staticmethod
-    def __read_config() -> tuple[int, int, int, int, int, int, bool, str, str, str, list[str]] | bool:
+    def __read_config(config_path="config.json") -> tuple[
+                                                   int, int, int, int, int, int, bool, str, str, str, list[str], int, str, int, str, str, list[str], str, bool] | bool:
+        """
+        Reads the configuration from the config file and returns a tuple of the configuration parameters.
+
+        Args:
+            config_path (str, optional): The path of the config file. Defaults to "config.json".
+
+        Returns:
+            A tuple containing the configuration parameters if the file is valid, otherwise False.
+        """
+        try:
+            # Load the configuration from the JSON file
+            with open(config_path) as f:
+                config = json.load(f)
+
+            # Extract the configuration parameters
+            min_titles = config["minimum_titles"]
+            hard = config["hard_data_to_use"]
+            med = config["medium_data_to_use"]
+            easy = config["easy_data_to_use"]
+            points = config["total_points"]
+            debug = config["use_debug_(ONLY_IF_YOU_DEVELOPED_THIS!)"]
+            api = config["api"]
+            username = config["username"]
+            password = config["password"]
+            exclusion_titles = config["exclusion_titles"]
+
+            # Optional parameters, older config files do not include them
+            recent_exams = config.get("recent_exams_to_exclude", 0)
+            request_id = config.get("request_id", "")
+            deadline_ms = config.get("deadline_ms", 0)
+            question_source = config.get("question_source", "csv")
+            subject = config.get("subject", "")
+            students = config.get("students", [])
+            packet_format = config.get("packet_format", "xlsx")
+            balance_usage = config.get("balance_usage", False)
+
+            # Calculate the total number of questions
+            questions_amount = hard + med + easy
+
+            # Check if the configuration parameters are valid
+            if (
+                    isinstance(questions_amount, int)
+                    and isinstance(min_titles, int)
+                    and isinstance(hard, int)
+                    and isinstance(med, int)
+                    and isinstance(easy, int)
+                    and isinstance(points, int)
+                    and isinstance(debug, bool)
+                    and isinstance(api, str)
+                    and isinstance(username, str)
+                    and isinstance(password, str)
+                    and isinstance(exclusion_titles, list)
+                    and isinstance(recent_exams, int)
+                    and recent_exams >= 0
+                    and isinstance(request_id, str)
+                    and re.match(r"^[a-zA-Z0-9_-]{0,64}$", request_id)
+                    and isinstance(deadline_ms, int)
+                    and deadline_ms >= 0
+                    and question_source in ("csv", "sqlite")
+                    and isinstance(subject, str)
+                    and re.match(r"^[a-zA-Z0-9_-]{0,64}$", subject)
+                    and isinstance(students, list)
+                    and all(isinstance(student, str) and re.match(r"^[a-zA-Z0-9 _-]{1,64}$", student)
+                            for student in students)
+                    and packet_format in PACKET.FORMATS
+                    and isinstance(balance_usage, bool)
+            ):
+                return (
+                    questions_amount,
+                    min_titles,
+                    hard,
+                    med,
+                    easy,
+                    points,
+                    debug,
+                    api,
+                    username,
+                    password,
+                    exclusion_titles,
+                    recent_exams,
+                    request_id,
+                    deadline_ms,
+                    question_source,
+                    subject,
+                    students,
+                    packet_format,
+                    balance_usage,
+                )
+            else:
+
+                log.critical("Invalid config file parameters.")
+                return False
+        except FileNotFoundError as fnfe:
+
+            log.critical(f"File not found: {fnfe}")
+            return False
+        except Exception as e:
+
+            log.error(f"Unexpected error: {e}")
+            return False
+
+    @staticmethod
+    def publish_bank(subject="") -> bool:
+        """
+            Reads and validates the 'Data.csv' of a subject, then publishes it as its shared question bank 'Data.bank'.
+
+            Args:
+                subject (str, optional): The subject of the bank. Defaults to "".
+
+            Returns:
+                bool: True if the bank was published, False otherwise.
+            """
+        bank = DATABASE.__read_csv(source=BANK_REGISTRY.source(subject))
+        return bank is not False and bank.publish(BANK_REGISTRY.path(subject, "Data.bank"))
+
+    @staticmethod
+    def import_bank(subject="") -> bool:
+        """
+            Reads and validates the 'Data.csv' of a subject, then imports it into its 'Questions.db'.
+
+            Args:
+                subject (str, optional): The subject of the bank. Defaults to "".
+
+            Returns:
+                bool: True if the bank was imported, False otherwise.
+            """
+        bank = DATABASE.__read_csv(source=BANK_REGISTRY.source(subject))
+        return bank is not False and QUESTIONS.import_bank(bank, BANK_REGISTRY.path(subject, "Questions.db"))
+
+    @staticmethod
+    def __load_bank(subject="") -> BANK | bool:
+        """
+            Loads the question bank of a subject.
+
+            Long-running processes take a snapshot of the bank kept by their bank registry,
+            other processes build it from the files.
+
+            Args:
+                subject (str, optional): The subject of the bank. Defaults to "".
+
+            Returns:
+                BANK: The bank of questions.
+                bool: False if an error occurs.
+            """
+        if bank_registry is not None:
+            return bank_registry.snapshot(subject)
+        return DATABASE.__build_bank(subject)
+
+    @staticmethod
+    def __build_bank(subject="") -> BANK | bool:
+        """
+            Builds the question bank of a subject, attaching to its published bank when it is up-to-date.
+
+            The first process to find no up-to-date published bank reads and validates 'Data.csv',
+            then publishes it to 'Data.bank' so every other process can attach to it instead.
+            When rows were only appended since the published bank was read, only those rows are read.
+
+            Args:
+                subject (str, optional): The subject of the bank. Defaults to "".
+
+            Returns:
+                BANK: The bank of questions.
+                bool: False if an error occurs.
+            """
+        handle = BANK_REGISTRY.path(subject, "Data.bank")
+        source = BANK_REGISTRY.source(subject)
+        published = BANK.attach(handle)
+        if published is not None and published.matches(source):
+            return published
+
+        bank = DATABASE.__read_csv(published, source)
+        if bank is not False:
+            bank.publish(handle)
+        return bank
+
+    @staticmethod
+    def __build_warm_bank(subject="") -> BANK | bool:
+        """
+            Builds the question bank of a subject for a long-running process, with what requests derive from it.
+
+            The bank managers call this on their watcher thread, before the new bank is swapped in, so the first
+            request on a new bank does not pay for its difficulty bitsets, its statistics or, for subjects that
+            balance question usage, its usage trees.
+
+            Args:
+                subject (str, optional): The subject of the bank. Defaults to "".
+
+            Returns:
+                BANK: The bank of questions.
+                bool: False if an error occurs.
+            """
+        bank = DATABASE.__build_bank(subject)
+        if bank is False:
+            return False
+        bank.difficulty_mask(BANK.DIFFICULTIES[0])
+        DATABASE.__bank_statistics(bank, subject)
+        if os.path.exists(BANK_REGISTRY.path(subject, "Usage.db")):
+            DATABASE.__load_usage(bank, subject)
+        return bank
+
+    @staticmethod
+    def __load_statistics(subject="") -> STATISTICS | bool:
         """
-        Reads the configuration from the 'config.json' file and returns a tuple of the configuration parameters.
+            Loads the statistics of the question bank of a subject.
 
-        Returns:
-            A tuple containing the configuration parameters if the file is valid, otherwise False.
+            The statistics are kept with the bank they were built from, and saved to 'Data.stats' next to
+            the published bank so other processes load them instead of building them. They are rebuilt
+            the first time they are needed after the bank changed, long-running processes build them
+            with every new bank before swapping it in, see `__build_warm_bank`.
+
+            Args:
+                subject (str, optional): The subject of the bank. Defaults to "".
+
+            Returns:
+                STATISTICS: The statistics of the bank.
+                bool: False if the bank could not be loaded.
+            """
+        bank = DATABASE.__load_bank(subject)
+        if bank is False:
+            return False
+        return DATABASE.__bank_statistics(bank, subject)
+
+    @staticmethod
+    def __bank_statistics(bank: BANK, subject="") -> STATISTICS:
         """
-        try:
-            # Load the configuration from the JSON file
-            with open("config.json") as f:
-                config = json.load(f)
+            Returns the statistics of a question bank, loading or building them on first use.
 
-            # Extract the configuration parameters
-            min_titles = config["minimum_titles"]
-            hard = config["hard_data_to_use"]
-            med = config["medium_data_to_use"]
-            easy = config["easy_data_to_use"]
-            points = config["total_points"]
-            debug = config["use_debug_(ONLY_IF_YOU_DEVELOPED_THIS!)"]
-            api = config["api"]
-            username = config["username"]
-            password = config["password"]
-            exclusion_titles = config["exclusion_titles"]
+            Args:
+                bank (BANK): The bank of questions.
+                subject (str, optional): The subject of the bank. Defaults to "".
 
-            # Calculate the total number of questions
-            questions_amount = hard + med + easy
+            Returns:
+                STATISTICS: The statistics of the bank.
+            """
+        if bank.statistics is None:
+            path = BANK_REGISTRY.path(subject, "Data.stats")
+            statistics = STATISTICS.load(path, bank.generation) if bank.generation else None
+            if statistics is None:
+                colorlog.debug("Building the question bank statistics...")
+                statistics = STATISTICS.build(bank)
+                if bank.generation:
+                    statistics.save(path)
+            bank.statistics = statistics
+        return bank.statistics
 
-            # Check if the configuration parameters are valid
-            if (
-                    isinstance(questions_amount, int)
-                    and isinstance(min_titles, int)
-                    and isinstance(hard, int)
-                    and isinstance(med, int)
-                    and isinstance(easy, int)
-                    and isinstance(points, int)
-                    and isinstance(debug, bool)
-                    and isinstance(api, str)
-                    and isinstance(username, str)
-                    and isinstance(password, str)
-                    and isinstance(exclusion_titles, list)
-            ):
-                return (
-                    questions_amount,
-                    min_titles,
-                    hard,
-                    med,
-                    easy,
-                    points,
-                    debug,
-                    api,
-                    username,
-                    password,
-                    exclusion_titles,
-                )
-            else:
+    @staticmethod
+    def __load_usage(bank: BANK, subject="") -> USAGE:
+        """
+            Loads the usage counts of a question bank, kept with the bank once loaded.
 
-                log.critical("Invalid config file parameters.")
-                return False
-        except FileNotFoundError as fnfe:
+            Args:
+                bank (BANK): The bank of questions.
+                subject (str, optional): The subject of the bank. Defaults to "".
 
-            log.critical(f"File not found: {fnfe}")
-            return False
-        except Exception as e:
+            Returns:
+                USAGE: The usage counts of the bank.
+            """
+        if bank.usage is None:
+            colorlog.debug("Loading the question usage counts...")
+            bank.usage = USAGE(bank, BANK_REGISTRY.path(subject, "Usage.db"))
+        return bank.usage
 
-            log.error(f"Unexpected error: {e}")
-            return False
+    @staticmethod
+    def __read_appended(previous: BANK, source="Data.csv"):
+        """
+            Reads the rows appended to the CSV file since the previous bank was read.
+
+            The first `source_offset` bytes of the file must still hash to the stored checksum and end on a line break,
+            otherwise the file was edited somewhere before its end and must be read again from the start.
+
+            Args:
+                previous (BANK): The bank read from an earlier version of the file.
+                source (str, optional): The path of the CSV file. Defaults to "Data.csv".
+
+            Returns:
+                tuple[str, hashlib.blake2b]: The appended text, and the checksum of the whole file so far.
+                None: If the file was not only appended to.
+            """
+        if not previous.source_offset or os.path.getsize(source) < previous.source_offset:
+            return None
+
+        checksum = hashlib.blake2b()
+        with open(source, "rb") as file:
+            remaining = previous.source_offset
+            last = b""
+            while remaining:
+                chunk = file.read(min(remaining, 1 << 20))
+                if not chunk:
+                    return None
+                checksum.update(chunk)
+                remaining -= len(chunk)
+                last = chunk[-1:]
+            if last != b"\n" or checksum.hexdigest() != previous.source_checksum:
+                return None
+
+            appended = file.read()
+        checksum.update(appended)
+        return appended.decode("utf-8"), checksum
 
     @staticmethod
-    def __read_csv() -> list[list[str]] | bool:
+    def __read_csv(previous: BANK = None, source="Data.csv") -> BANK | bool:
         """
-            Reads a CSV file and returns a list of questions.
+            Reads a CSV file and returns a bank of questions.
 
             The CSV file is expected to have the following structure:
             - Each row represents a question.
@@ -712,24 +3700,49 @@ class DATABASE:
             - The third column represents the score.
             - The fourth column represents the URL (optional).
 
+            The file may be stored compressed with gzip, bzip2 or xz, it is then decompressed as it is parsed.
+
+            Args:
+                previous (BANK, optional): A bank read from an earlier version of the file. If the file was only
+                    appended to since, only the appended rows are read and added to a copy of it. Defaults to None.
+                source (str, optional): The path of the CSV file. Defaults to "Data.csv".
+
             Returns:
-                list[list[str]]: A list of questions, where each question is a list of strings.
+                BANK: The bank of questions.
                 bool: False if an error occurs.
             """
+        raw = None
         try:
-            # Log a debug message to indicate that the CSV file is being read
-            colorlog.debug("Reading CSV file...")
+            source_stat = os.stat(source)
+            compressed = CHECKSUM_READER.compressed(source)
+
+            # Only read the appended rows if everything before them is unchanged, compressed files are always read whole
+            appended = None
+            if previous is not None and not compressed:
+                appended = DATABASE.__read_appended(previous, source)
+            if appended is not None:
+                colorlog.debug("Reading the rows appended to the CSV file...")
+                questions = previous.copy()
+                line_base = previous.source_lines
+                file = io.StringIO(appended[0], newline="")
+            else:
+                # Log a debug message to indicate that the CSV file is being read
+                colorlog.debug("Reading CSV file...")
+
+                # Initialize an empty bank to store the questions
+                questions = BANK()
+                line_base = 0
 
-            # Initialize an empty list to store the questions
-            questions = []
+                # Open the CSV file with UTF-8 encoding, hashing it while it is read
+                file, raw = CHECKSUM_READER.open_text(source)
 
-            # Open the CSV file in read mode with UTF-8 encoding
-            with open("Data.csv", mode="r", encoding="utf-8") as file:
+            with file:
                 # Create a CSV reader object
                 reader = csv.reader(file)
 
                 # Ignore the header row
-                next(reader)
+                if appended is None:
+                    next(reader)
 
                 # Iterate over each row in the CSV file
                 for row in reader:
@@ -758,7 +3771,7 @@ class DATABASE:
                     if difficulty not in ["Hard", "Medium", "Easy"]:
                         # Log a critical error message if the difficulty level is invalid
                         log.critical(
-                            f"Invalid difficulty level: {difficulty} at line {reader.line_num}."
+                            f"Invalid difficulty level: {difficulty} at line {line_base + reader.line_num}."
                         )
                         return False
 
@@ -768,7 +3781,7 @@ class DATABASE:
                     except ValueError:
                         # Log a critical error message if the score is not an integer
                         log.critical(
-                            f"Invalid score format at line {reader.line_num}: {row[3]}."
+                            f"Invalid score format at line {line_base + reader.line_num}: {row[3]}."
                         )
                         return False
 
@@ -776,7 +3789,7 @@ class DATABASE:
                     if not 0 <= score <= 100:
                         # Log a critical error message if the score is out of range
                         log.critical(
-                            f"Invalid score range at line {reader.line_num}: {score}."
+                            f"Invalid score range at line {line_base + reader.line_num}: {score}."
                         )
                         return False
 
@@ -788,10 +3801,27 @@ class DATABASE:
                         else None
                     )
 
-                    # Add the question to the list of questions
-                    questions.append([*row[:url_column_index], url])
+                    # Add the question to the bank of questions
+                    questions.append(row[0], row[1].strip(), difficulty, score, url)
+                questions.source_lines = line_base + reader.line_num
+                if raw is not None:
+                    raw.drain()
+                    colorlog.debug(f"Read {raw.bytes_read} bytes from {source}")
+
+            # Remember which part of the file was read, unless it changed while it was being read
+            checksum = appended[1] if appended is not None else raw.checksum
+            if appended is None:
+                questions.source_lineage = checksum.hexdigest()
+            if os.stat(source).st_mtime_ns == source_stat.st_mtime_ns:
+                questions.source_size = source_stat.st_size
+                questions.source_mtime_ns = source_stat.st_mtime_ns
+                # Rows appended to a compressed file cannot be read on their own
+                questions.source_offset = 0 if compressed else source_stat.st_size
+                questions.source_checksum = checksum.hexdigest()
+            else:
+                questions.source_offset = 0
 
-            # Return the list of questions
+            # Return the bank of questions
             return questions
 
         except FileNotFoundError as fnfe:
@@ -804,80 +3834,119 @@ class DATABASE:
             log.error(f"Unexpected error: {e}")
             return False
 
-    def __generate_data(self, questions, exclude_list) -> tuple[
-                                                              list[list[str]], int, dict[str, float], list[str]] | bool:
+        finally:
+            # The decompressors do not close the file they read from, so the stored bytes are closed here
+            if raw is not None:
+                raw.close()
+
+    def __generate_data(self, questions, exclude_list, seen_mask=0) -> tuple[
+                                                              list[list[str]], int, dict[str, float], set[str], int, dict[str, int]] | bool | None:
         """
             Generate exam data based on the provided questions and exclude list.
 
+            In strict mode (`deadline_ms` of 0) the search runs until an exam matches every rule.
+            With a deadline, the search keeps the complete exam closest to the points target and
+            the title minimum, and returns it once the deadline passes.
+
             Args:
-            questions (list): A list of questions to generate the exam from.
+            questions (BANK): The bank of questions to generate the exam from.
             exclude_list (list): A list of titles to exclude from the exam.
+            seen_mask (int, optional): A bitset of question indexes the user recently received. Defaults to 0.
 
             Returns:
-            tuple: A tuple containing the generated exam, total points, difficulty ratios, and total titles.
+            tuple: A tuple containing the generated exam, total points, difficulty ratios, total titles,
+            a bitset of the question indexes used by the exam, and its deviation from the rules.
+            None: If the deadline passed before any complete exam was found.
             """
         try:
+            # If no questions are provided, load the question bank
+            if not questions:
+                questions = self.__load_bank()
+                if questions is False:
+                    # Return False if reading from CSV fails
+                    return False
+
+            # Extract excluded titles from the exclude list, entries may hold several comma separated titles
+            excluded_titles = {
+                title.strip() for titles in exclude_list for title in titles.split(",")
+            }
+
+            # The SQLite bank picks its candidates with queries, nothing is filtered here
+            if isinstance(questions, QUESTIONS):
+                eligible_indexes = None
+            else:
+                # Combine the cached bitset of the excluded titles with the recently seen questions,
+                # so the filter is a single mask no matter how many titles or how long a history there is
+                # Split the eligible questions by difficulty once, every attempt then only samples from them
+                eligible_mask = BITSET.full(len(questions)) & ~(seen_mask | questions.exclusion_mask(excluded_titles))
+                eligible_indexes = {
+                    difficulty: BITSET.to_indexes(eligible_mask & questions.difficulty_mask(difficulty))
+                    for difficulty in BANK.DIFFICULTIES
+                }
+
+            # Weight the draws toward the least used questions, see `USAGE`
+            samplers = None
+            if BALANCE_USAGE and eligible_indexes is not None:
+                usage = self.__load_usage(questions, SUBJECT)
+                usage.refresh(questions)
+                eligible_bytes = eligible_mask.to_bytes((len(questions) + 7) // 8, "little")
+                samplers = {
+                    difficulty: usage.sampler(difficulty, candidates, eligible_bytes)
+                    for difficulty, candidates in eligible_indexes.items()
+                }
+
+            # In anytime mode, track the best complete exam until the deadline
+            deadline = time.perf_counter() + DEADLINE_MS / 1000 if DEADLINE_MS else None
+            best = None
+            best_distance = None
+
             # Continue generating exam data until a valid exam is created
             while True:
-                # If no questions are provided, read from the CSV file
-                if not questions:
-                    questions = self.__read_csv()
-                    if questions is False:
-                        # Return False if reading from CSV fails
-                        return False
+                # Return the best exam so far once the deadline passes
+                if deadline is not None and time.perf_counter() >= deadline:
+                    if best is None:
+                        log.warning(f"No complete exam was found within the {DEADLINE_MS} ms deadline")
+                        return None
+                    exam_indexes, total_points, difficulty_ratios, total_titles = best
+                    break
 
                 # Initialize exam data
-                exam = []
+                exam_indexes = []
                 total_points = 0
-                total_titles = []
+                # The titles are a set, so checking a title stays constant time in exams of thousands of questions
+                total_titles = set()
                 difficulty_counts = {"Hard": 0, "Medium": 0, "Easy": 0}
 
-                # Extract excluded titles from the exclude list
-                excluded_titles = [
-                    title.strip() for title in exclude_list[0].split(",")
-                ]
-
-                # Filter out questions with excluded titles
-                filtered_data = [
-                    q for q in questions if q[1] not in excluded_titles
-                ]
-
-                # Generate exam questions
-                for i in range(TOTAL_DATA_AMOUNT):
-                    # If no more questions are available, break the loop
-                    if not filtered_data:
-                        break
-
-                    # Determine the difficulty level
-                    if i < HARD_DATA_AMOUNT:
-                        difficulty = "Hard"
-                    elif i < HARD_DATA_AMOUNT + MEDIUM_DATA_AMOUNT:
-                        difficulty = "Medium"
+                # Generate exam questions, picking distinct random questions of every difficulty
+                for difficulty, amount in (
+                        ("Hard", HARD_DATA_AMOUNT),
+                        ("Medium", MEDIUM_DATA_AMOUNT),
+                        ("Easy", EASY_DATA_AMOUNT),
+                ):
+                    if eligible_indexes is None:
+                        # The SQLite bank queries its own candidates
+                        selected_questions = questions.sample(
+                            difficulty, amount, excluded_titles, seen_mask, TOTAL_POINTS
+                        )
                     else:
-                        difficulty = "Easy"
-
-                    # Select a random question
-                    selected_question_index = random.randint(
-                        0, len(filtered_data) - 1
-                    )
-                    selected_question = filtered_data[selected_question_index]
+                        candidates = eligible_indexes[difficulty]
+                        if samplers is not None:
+                            picks = samplers[difficulty](amount)
+                        else:
+                            picks = random.sample(candidates, min(amount, len(candidates)))
+                        selected_questions = (
+                            (index, questions.title(index), questions.scores[index]) for index in picks
+                        )
 
-                    # Check if the question meets the criteria
-                    if (
-                            selected_question not in exam
-                            and selected_question[2] == difficulty
-                    ):
-                        # Add the question to the exam
-                        exam.append(selected_question)
-                        total_points += int(selected_question[3])
-                        difficulty_counts[selected_question[2]] += 1
-                        filtered_data.pop(selected_question_index)
-                        title_value = selected_question[1]
-                        if title_value not in total_titles:
-                            total_titles.append(title_value)
+                    # Add the questions to the exam
+                    for index, title_value, score in selected_questions:
+                        exam_indexes.append(index)
+                        total_points += score
+                        difficulty_counts[difficulty] += 1
+                        total_titles.add(title_value)
 
                 # Check if the exam meets the requirements
-                if len(exam) != TOTAL_DATA_AMOUNT:
+                if len(exam_indexes) != TOTAL_DATA_AMOUNT:
                     continue
 
                 # Calculate difficulty ratios
@@ -891,6 +3960,12 @@ class DATABASE:
                     for k, v in difficulty_counts.items()
                 }
 
+                # Remember the exam if it is the closest to the rules so far
+                distance = abs(total_points - TOTAL_POINTS) + max(0, MINIMUM_TYPES - len(total_titles))
+                if deadline is not None and (best is None or distance < best_distance):
+                    best = exam_indexes, total_points, difficulty_ratios, total_titles
+                    best_distance = distance
+
                 # Check if the total points and titles meet the requirements
                 if total_points != TOTAL_POINTS:
                     continue
@@ -900,62 +3975,76 @@ class DATABASE:
                 # Break the loop if a valid exam is created
                 break
 
-            # Return the generated exam data
-            return exam, total_points, difficulty_ratios, total_titles
+            # How far the exam is from the rules, always zero in strict mode
+            deviation = {
+                "points": total_points - TOTAL_POINTS,
+                "titles": max(0, MINIMUM_TYPES - len(total_titles)),
+            }
+
+            # Count the uses of the questions, so the next exams favour the others
+            if samplers is not None:
+                questions.usage.record(exam_indexes, questions)
+
+            # Return the generated exam data, as rows in the CSV layout
+            exam = [questions.row(index) for index in exam_indexes]
+            return exam, total_points, difficulty_ratios, total_titles, BITSET.from_indexes(
+                exam_indexes, len(questions)
+            ), deviation
         except Exception as e:
             # Log any unexpected errors
             log.error(f"Unexpected error: {e}")
             return False
 
     @staticmethod
-    def __create_excel() -> bool:
+    def __create_excel(exam, summary=None, output_dir="", debug=False) -> bool:
         """
-            Creates an Excel file from a text file and saves it as an Excel file.
+            Streams the rows of an exam into 'Exam.xlsx'.
+
+            The rows are written in the write-only mode of openpyxl, which moves them to disk as they are added,
+            so memory does not grow with the size of the exam. The workbook is written to a temporary file
+            and atomically renamed into place.
+
+            Args:
+                exam (list[list[str]]): The questions of the exam, as rows in the CSV layout.
+                summary (dict, optional): Values to write to a second 'Summary' sheet. Defaults to None.
+                output_dir (str, optional): The directory to write 'Exam.xlsx' into. Defaults to the current one.
+                debug (bool, optional): Write the type and difficulty columns. Defaults to False.
 
             Returns:
                 bool: True if the Excel file is created successfully, False otherwise.
             """
         try:
-            # Initialize an empty list to store the data
-            data = []
-
-            # Set the headers for the Excel file based on the DEBUG_DB flag
-            if DEBUG_DB:
+            # Set the headers for the Excel file based on the debug flag
+            if debug:
                 headers = ["URL", "Data", "Type", "Range", "Weight"]
             else:
                 headers = ["URL", "Data", "Weight"]
 
-            # Read the lines from the text file
-            with open("Exam.txt", "r") as file:
-                lines = file.readlines()
-
-                # Iterate over the lines and extract the relevant data
-                for i, line in enumerate(lines):
-                    if i % 2 != 0:
-                        continue
-
-                    parts = line.strip().split("&")
-
-                    # Check if the number of parts matches the expected length based on the DEBUG_DB flag
-                    if DEBUG_DB and len(parts) == 5:
-                        data.append(parts)
-                    elif not DEBUG_DB and len(parts) == 3:
-                        data.append(parts)
-
-            # Create a DataFrame from the data and set the headers
-            df = pd.DataFrame(data, columns=headers)
-
-            # Save the DataFrame as an Excel file
-            df.to_excel("Exam.xlsx", index=False)
-
-            # Remove the original text file
-            os.remove("Exam.txt")
-
+            book = Workbook(write_only=True)
+            sheet = book.create_sheet("Sheet1")
+            sheet.append(headers)
+            for sublist in exam:
+                # Write the fields as they are, a question that cannot be written fails the whole exam
+                if len(sublist) != 5:
+                    raise ValueError(f"Malformed question row: {sublist}")
+                if debug:
+                    sheet.append([sublist[4], sublist[0], sublist[1], sublist[2], sublist[3]])
+                else:
+                    sheet.append([sublist[4], sublist[0], sublist[3]])
+
+            if summary:
+                summary_sheet = book.create_sheet("Summary")
+                summary_sheet.append(["Key", "Value"])
+                for key, value in summary.items():
+                    summary_sheet.append([key, value])
+
+            # Save the workbook to a temporary Excel file and atomically publish it
+            book.save(os.path.join(output_dir, "Exam.tmp.xlsx"))
+            os.replace(
+                os.path.join(output_dir, "Exam.tmp.xlsx"),
+                os.path.join(output_dir, "Exam.xlsx"),
+            )
             return True
-        except FileExistsError as fnfe:
-            # Log an error if the text file is not found
-            log.critical(f"File not found: {fnfe}")
-            return False
         except Exception as e:
             # Log any unexpected errors
             log.error(f"Unexpected error: {e}")
@@ -966,6 +4055,8 @@ class DATABASE:
         """
         Checks if a given password is common or not.
 
+        The password is checked against the built-in list, then against the memory-mapped blocklist.
+
         Args:
         password (str): The password to check.
 
@@ -1015,8 +4106,46 @@ class DATABASE:
             return True
         elif password.lower() in common:
             return True
+        elif password in blocklist:
+            return True
         return False
 
+    def __check_feasibility(self, exclusion_titles) -> bool | None:
+        """
+        Checks if the configuration violates a rule the bank can never meet, and writes the answer to 'Feasibility.json'.
+
+        Args:
+            exclusion_titles (list[str]): The titles to exclude from the exam.
+
+        Returns:
+            bool: True if no rule is violated, False if the configuration is impossible.
+            None: If the statistics could not be loaded.
+        """
+        statistics = self.__load_statistics(SUBJECT)
+        if statistics is False:
+            return None
+        self.__mark("load_statistics")
+
+        result = statistics.feasibility(
+            {"Hard": HARD_DATA_AMOUNT, "Medium": MEDIUM_DATA_AMOUNT, "Easy": EASY_DATA_AMOUNT},
+            MINIMUM_TYPES,
+            TOTAL_POINTS,
+            {title.strip() for title in exclusion_titles if title.strip()},
+        )
+        self.__mark("feasibility")
+        for problem in result["problems"]:
+            log.warning(f"Infeasible configuration: {problem}")
+
+        # Write the answer for the front end
+        feasibility_path = os.path.join(OUTPUT_DIR, "Feasibility.json")
+        with open(f"{feasibility_path}.tmp", "w") as file:
+            json.dump(result, file, indent=4)
+        os.replace(f"{feasibility_path}.tmp", feasibility_path)
+        if REQUEST_STATUS is not None:
+            REQUEST_STATUS.output = feasibility_path
+            REQUEST_STATUS.details["feasibility"] = result
+        return result["no_rule_violated"]
+
     def __exam_generator(self, username) -> bool:
         """
         Generates an exam based on the provided username.
@@ -1026,70 +4155,104 @@ class DATABASE:
 
         Returns:
             bool: True if the exam is generated successfully, False otherwise.
+            None: If no complete exam was found before the deadline.
         """
 
-        # Read the CSV file containing the exam questions
-        questions = self.__read_csv()
+        # Load the bank of exam questions
+        if QUESTION_SOURCE == "sqlite":
+            database_name = BANK_REGISTRY.path(SUBJECT, "Questions.db")
+            try:
+                questions = QUESTIONS(database_name)
+            except sqlite3.Error as e:
+                log.critical(f"Failed to open the imported question bank {database_name}: {e}")
+                return False
+        else:
+            questions = self.__load_bank(SUBJECT)
         if questions is False:
-            # If the CSV file is not read successfully, return False
+            # If the bank is not loaded successfully, return False
             return False
+        self.__mark("load_bank")
 
         try:
             # Get the excluded titles for the user
-            Exclude_list = sql.get_excluded_titles(username)
+            Exclude_list = sql.get_excluded_titles(username, use_replica=True)
             if Exclude_list is False:
                 # If the excluded titles are not retrieved successfully, return False
                 return False
 
+            # Get the questions the user received in their last exams, including those still being written
+            seen_mask = 0
+            if RECENT_EXAMS:
+                if self.pipeline is not None:
+                    self.pipeline.wait_for(username)
+                seen_mask = sql.get_recent_questions(username, RECENT_EXAMS, SUBJECT, questions.source_lineage)
+                if seen_mask is False:
+                    # If the history is not retrieved successfully, return False
+                    return False
+            self.__mark("user_lookup")
+
+            # A class packet holds an exam for every student, written into a single file
+            if STUDENTS:
+                return self.__packet_generator(username, questions, Exclude_list, seen_mask)
+
             # Generate the exam data based on the questions and excluded titles
-            temp = self.__generate_data(questions, Exclude_list)
-            if temp is False:
+            temp = self.__generate_data(questions, Exclude_list, seen_mask)
+            if temp is None:
+                # If the deadline passed without a complete exam, return None
+                return None
+            elif temp is False:
                 # If the exam data is not generated successfully, return False
                 return False
             else:
                 # Unpack the exam data into separate variables
-                exam, total_points, difficulty_ratios, total_titles = temp
-
-            # Check if the Exam.txt file already exists and remove it if it does
-            if os.path.exists("Exam.txt"):
-                os.remove("Exam.txt")
-
-            # Write the exam data to the Exam.txt file
-            with open("Exam.txt", "w") as file:
-                # Check if debug mode is enabled
-                if DEBUG_DB:
-                    # Write a debug message to the file
-                    file.write("Debug mode is on.\n\n")
-
-                    # Write the exam data to the file in debug format
-                    for sublist in exam:
-                        file.write(
-                            f"{sublist[4]} & {sublist[0]} & Type: {sublist[1]} & Difficulty: {sublist[2]} & [{sublist[3]}]\n"
-                        )
-                        file.write(
-                            f"{sublist[4]} & {sublist[0]} & Type: {sublist[1]} & Difficulty: {sublist[2]} & [{sublist[3]}]\n"
-                        )
-                else:
-
-                    # Write the exam data to the file in normal format
-                    for sublist in exam:
-                        file.write(f"{sublist[4]} & {sublist[0]} & [{sublist[3]}]\n")
-                        file.write(f"{sublist[4]} & {sublist[0]} & [{sublist[3]}]\n")
-
-                # Write the total points to the file
-                file.write(f"\n\nTotal exam is out of {TOTAL_POINTS} points.")
-
-            # Pause for 1 second
-            time.sleep(1)
-
-            # Create an Excel file based on the exam data
-            msg = self.__create_excel()
-            if msg is False:
-                # If the Excel file is not created successfully, return False
-                return False
+                exam, total_points, difficulty_ratios, total_titles, exam_mask, deviation = temp
+            self.__mark("generate")
+
+            # Report exams that miss the rules, this only happens in anytime mode
+            summary = None
+            if deviation["points"] or deviation["titles"]:
+                log.warning(
+                    f"Returning the best exam found within {DEADLINE_MS} ms, "
+                    f"{deviation['points']:+} points off target and {deviation['titles']} titles short"
+                )
+                summary = {
+                    "Total points": total_points,
+                    "Requested points": TOTAL_POINTS,
+                    "Points deviation": deviation["points"],
+                    "Titles used": len(total_titles),
+                    "Requested minimum titles": MINIMUM_TYPES,
+                    "Titles missing": deviation["titles"],
+                }
+            if REQUEST_STATUS is not None:
+                REQUEST_STATUS.details["deviation"] = deviation
+
+            if self.pipeline is not None and REQUEST_STATUS is not None:
+                # Hand the exam to the output stage, the next request is handled while it is written,
+                # its history is recorded by the output thread, on its own connection, once it is written
+                history = None
+                if RECENT_EXAMS:
+                    keep, subject, bank = RECENT_EXAMS, SUBJECT, questions.source_lineage
+
+                    def history():
+                        return self.__output_sql.add_exam_history(username, exam_mask, keep, subject, bank)
+                self.pipeline.submit(REQUEST_STATUS, OUTPUT_DIR, exam, summary, DEBUG_DB, username, history)
+            else:
+                # Stream the exam straight into the Excel file
+                msg = self.__create_excel(exam, summary, OUTPUT_DIR, DEBUG_DB)
+                if msg is False:
+                    # If the Excel file is not created successfully, return False
+                    return False
+                self.__mark("write_excel")
+                if REQUEST_STATUS is not None:
+                    REQUEST_STATUS.output = os.path.join(OUTPUT_DIR, "Exam.xlsx")
+                log.info(f"Exam Generated and saved to {os.path.join(OUTPUT_DIR, 'Exam.xlsx')}")
+
+                # Remember the questions of this exam so the next exams avoid them
+                if RECENT_EXAMS:
+                    if not sql.add_exam_history(username, exam_mask, RECENT_EXAMS, SUBJECT, questions.source_lineage):
+                        return False
 
             # Log the exam generation information
-            log.info("Exam Generated and saved to Exam.xlsx")
             colorlog.debug("Exam Generation information:")
             colorlog.debug(f"Total Points in exam: {total_points}")
             colorlog.debug(f"Number of Questions Included in exam: {len(exam)}")
@@ -1102,25 +4265,94 @@ class DATABASE:
             # Log any unexpected errors
             log.error(f"Unexpected error: {e}")
             return False
+        finally:
+            # The imported bank is opened for every request, close it however the request ends
+            if isinstance(questions, QUESTIONS):
+                questions.close()
+
+    def __packet_generator(self, username, questions, exclude_list, seen_mask) -> bool | None:
+        """
+        Generates an exam for every student of the request, and streams them into a class packet.
+
+        Args:
+            username (str): The username of the user for whom the packet is being generated.
+            questions (BANK | QUESTIONS): The bank of questions to generate the exams from.
+            exclude_list (list): A list of titles to exclude from the exams.
+            seen_mask (int): A bitset of question indexes the user recently received.
+
+        Returns:
+            bool: True if the packet is generated successfully, False otherwise.
+            None: If no complete exam was found before the deadline for one of the students.
+        """
+        packet_path = os.path.join(OUTPUT_DIR, f"Packet.{PACKET_FORMAT}")
+        packet = PACKET(packet_path, PACKET_FORMAT, DEBUG_DB)
+        packet_mask = 0
+        try:
+            for student in STUDENTS:
+                temp = self.__generate_data(questions, exclude_list, seen_mask)
+                if temp is None or temp is False:
+                    # A packet is only delivered with the exam of every student
+                    packet.abort()
+                    return temp
+                exam, total_points, difficulty_ratios, total_titles, exam_mask, deviation = temp
+                packet.add(student, exam, total_points, len(total_titles), deviation)
+                packet_mask |= exam_mask
+            packet.close()
+            self.__mark("write_packet")
+        except Exception as e:
+            packet.abort()
+            log.error(f"An error occurred while writing the class packet. as {e}")
+            return False
+
+        if REQUEST_STATUS is not None:
+            REQUEST_STATUS.output = packet_path
+            REQUEST_STATUS.details["packet"] = {"format": PACKET_FORMAT, "exams": packet.exams}
+
+        # Remember the questions of the whole packet as one exam, so the next exams avoid them
+        if RECENT_EXAMS:
+            if not sql.add_exam_history(username, packet_mask, RECENT_EXAMS, SUBJECT, questions.source_lineage):
+                return False
+
+        log.info(f"Class packet of {packet.exams} exams saved to {packet_path}")
+        return True
+
+    @staticmethod
+    def __mark(stage):
+        """
+        Records the time spent in a stage on the status manifest of the current request, if any.
+
+        Args:
+            stage (str): The name of the stage that just finished.
+        """
+        if REQUEST_STATUS is not None:
+            REQUEST_STATUS.mark(stage)
 
-    def api(self):
+    def api(self, config_path="config.json"):
         """
         Handles API requests based on the provided configuration data.
 
+        Requests with a `request_id` write into 'Requests/<request_id>/' and publish a status manifest there,
+        requests without one use the working directory and 'ERROR.temp' as before.
+
+        Args:
+            config_path (str, optional): The path of the config file. Defaults to "config.json".
+
         Returns:
         bool: True if the API request is successful, False otherwise.
         """
+        global REQUEST_STATUS, OUTPUT_DIR
+        REQUEST_STATUS, OUTPUT_DIR = None, ""
         try:
             # Read configuration data from the config file
-            config_data = self.__read_config()
+            config_data = self.__read_config(config_path)
 
-            # If config data is False, return False
+            # If config data is False, report CCD, in the status manifest of the request if it has a valid id
             if config_data is False:
-                self.__error("CCD")
+                self.__reject(config_path, "CCD")
                 exit("Failed to read config file")
 
             # Unpack config data into global variables
-            global TOTAL_DATA_AMOUNT, MINIMUM_TYPES, HARD_DATA_AMOUNT, MEDIUM_DATA_AMOUNT, EASY_DATA_AMOUNT, TOTAL_POINTS, DEBUG_DB
+            global TOTAL_DATA_AMOUNT, MINIMUM_TYPES, HARD_DATA_AMOUNT, MEDIUM_DATA_AMOUNT, EASY_DATA_AMOUNT, TOTAL_POINTS, DEBUG_DB, RECENT_EXAMS, DEADLINE_MS, QUESTION_SOURCE, SUBJECT, STUDENTS, PACKET_FORMAT, BALANCE_USAGE
             (
                 TOTAL_DATA_AMOUNT,
                 MINIMUM_TYPES,
@@ -1133,25 +4365,78 @@ class DATABASE:
                 USERNAME,
                 PASSWORD,
                 EXCLUDE,
+                RECENT_EXAMS,
+                REQUEST_ID,
+                DEADLINE_MS,
+                QUESTION_SOURCE,
+                SUBJECT,
+                STUDENTS,
+                PACKET_FORMAT,
+                BALANCE_USAGE,
             ) = config_data
 
+            # Give requests with an id their own output directory and status manifest
+            if REQUEST_ID:
+                OUTPUT_DIR = os.path.join("Requests", REQUEST_ID)
+                os.makedirs(OUTPUT_DIR, exist_ok=True)
+                REQUEST_STATUS = STATUS(REQUEST_ID, OUTPUT_DIR)
+                REQUEST_STATUS.api = API
+                REQUEST_STATUS.mark("config")
+
             # Handle different API requests
             if API == "REC":
                 # Request to generate an exam
                 log.info(
                     f"A request has been made to generate an exam by the user {USERNAME}"
                 )
-                if sql.verify_password(USERNAME, PASSWORD):
-                    # Generate exam and log result
-                    if self.__exam_generator(USERNAME):
-                        log.info("Exam generated successfully based on the request")
+                if not BANK_REGISTRY.exists(SUBJECT):
+                    log.error(f"Unknown subject: {SUBJECT}")
+                    self.__error("USJ")
+                elif sql.verify_password(USERNAME, PASSWORD, use_replica=True):
+                    self.__mark("credentials")
+                    if sql.replica is not None and REQUEST_STATUS is not None:
+                        # How old the in-memory copy the credentials were read from was, None if read from the file
+                        staleness = sql.replica.last_staleness
+                        REQUEST_STATUS.details["replica_staleness_ms"] = (
+                            None if staleness is None else round(staleness * 1000, 3)
+                        )
+                    if self.REC_PER_MINUTE and not sql.take_token(USERNAME, self.REC_BURST, self.REC_PER_MINUTE):
+                        # The user generated too many exams recently
+                        log.warning(f"Rate limit exceeded by the user {USERNAME}")
+                        self.rate_limited += 1
+                        self.__error("RTL")
                     else:
-                        log.error("Failed to generate exam")
-                        self.__error("UKF")
+                        # Generate exam and log result
+                        result = self.__exam_generator(USERNAME)
+                        if result:
+                            log.info("Exam generated successfully based on the request")
+                        elif result is None:
+                            log.error("Failed to generate exam before the deadline")
+                            self.__error("DLE")
+                        else:
+                            log.error("Failed to generate exam")
+                            self.__error("UKF")
                 else:
                     self.__error("IC")
                     log.error("Wrong password given")
 
+            elif API == "RFC":
+                # Request to check if a configuration can be generated
+                log.info("A request has been made to check the feasibility of an exam configuration")
+                if not BANK_REGISTRY.exists(SUBJECT):
+                    log.error(f"Unknown subject: {SUBJECT}")
+                    self.__error("USJ")
+                else:
+                    result = self.__check_feasibility(EXCLUDE)
+                    if result:
+                        log.info("The configuration violates no rule, it may still be impossible as a whole")
+                    elif result is None:
+                        log.error("Failed to check the feasibility of the configuration")
+                        self.__error("UKF")
+                    else:
+                        log.warning("The configuration cannot be generated")
+                        self.__error("IMP")
+
             elif API == "RUC":
                 # Request to create a new user
                 username_regex = r"^[a-zA-Z ]{3,30}$"
@@ -1170,16 +4455,20 @@ class DATABASE:
                                 log.info("User created successfully based on the request")
                             else:
                                 log.error(f"Failed to create user {USERNAME}")
+                                self.__error("UKF")
                         else:
                             log.warning("Invalid password - Password is commonly used")
+                            self.__error("CP")
                     else:
                         log.warning(
                             "Invalid password - Password must be between 8 and 36 characters and contain at least one special character"
                         )
+                        self.__error("RGXF")
                 else:
                     log.warning(
                         "Invalid username - Username must be between 3 and 30 characters and contain only letters and spaces"
                     )
+                    self.__error("RGXF")
 
             elif API == "RDU":
                 if sql.verify_password(USERNAME, PASSWORD):
@@ -1222,10 +4511,501 @@ class DATABASE:
             log.error(f"Unexpected error occurred: {e}")
             self.__error("UKF")
 
+        # Publish the status manifest of requests with an id, unless the output stage publishes it
+        if REQUEST_STATUS is not None:
+            if not REQUEST_STATUS.deferred:
+                REQUEST_STATUS.publish()
+            return REQUEST_STATUS.code == "OK"
+
+    def profile(self, config_path="config.json"):
+        """
+        Handles a request exactly like `api`, while profiling it with cProfile and tracemalloc.
+
+        A report of the hottest functions and the top allocation sites is written next to the log file,
+        named after the API code and a hash of the config, with the raw cProfile stats beside it.
+        Nothing of this runs when profiling is not requested.
+
+        Args:
+            config_path (str, optional): The path of the config file. Defaults to "config.json".
+
+        Returns:
+            bool: The result of `api`.
+        """
+        profiler = cProfile.Profile()
+        tracemalloc.start(10)
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            return self.api(config_path)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.__write_profile(config_path, profiler, snapshot, peak, elapsed)
+
+    @staticmethod
+    def __write_profile(config_path, profiler, snapshot, peak, elapsed):
+        """
+        Writes the profiling report of a request next to the log file.
+
+        Args:
+            config_path (str): The path of the config file of the request.
+            profiler (cProfile.Profile): The profile of the request.
+            snapshot (tracemalloc.Snapshot): The allocations still alive at the end of the request.
+            peak (int): The peak traced memory of the request, in bytes.
+            elapsed (float): The wall time of the request, in seconds.
+        """
+        try:
+            # Tag the report with the API code and a hash of the config, the password is left out of the hash
+            try:
+                with open(config_path) as f:
+                    config = json.load(f)
+                config.pop("password", None)
+                api = re.sub(r"[^a-zA-Z0-9]", "", str(config.get("api", ""))) or "NONE"
+                config_hash = hashlib.blake2b(
+                    json.dumps(config, sort_keys=True).encode("utf-8"), digest_size=6
+                ).hexdigest()
+            except Exception:
+                api, config_hash = "NONE", "unreadable"
+
+            directory = os.path.dirname(os.path.abspath(log.filename))
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            path = os.path.join(directory, f"Profile_{api}_{config_hash}_{stamp}")
+            profiler.dump_stats(f"{path}.prof")
+
+            with open(f"{path}.txt", "w") as file:
+                file.write(f"API: {api}\n")
+                file.write(f"Config hash: {config_hash}\n")
+                file.write(f"Config file: {config_path}\n")
+                file.write(f"Wall time: {elapsed * 1000:.2f} ms\n")
+                file.write(f"Peak traced memory: {peak / 2 ** 20:.2f} MB\n")
+
+                # The hottest functions, by their own time and by the time spent below them
+                for sort_key in ("tottime", "cumulative"):
+                    file.write(f"\n\n===== Functions by {sort_key} =====\n")
+                    pstats.Stats(profiler, stream=file).strip_dirs().sort_stats(sort_key).print_stats(30)
+
+                # The lines that allocated the memory still alive at the end of the request
+                file.write("\n\n===== Top allocation sites =====\n")
+                statistics = snapshot.filter_traces(
+                    (
+                        tracemalloc.Filter(False, tracemalloc.__file__),
+                        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                    )
+                ).statistics("traceback")
+                for statistic in statistics[:25]:
+                    file.write(f"\n{statistic.size / 1024:.1f} KiB in {statistic.count} blocks\n")
+                    for line in statistic.traceback.format(limit=5, most_recent_first=True):
+                        file.write(f"{line}\n")
+
+            log.info(f"Profile of the {api} request written to {path}.txt")
+        except Exception as e:
+            log.error(f"Failed to write the profile of the request: {e}")
+
+    def __reject(self, config_path, code):
+        """
+        Rejects a request without handling it, reporting the error code like `api` would.
+
+        Args:
+            config_path (str): The path of the config file of the request.
+            code (str): The error code.
+        """
+        global REQUEST_STATUS, OUTPUT_DIR
+        REQUEST_STATUS, OUTPUT_DIR = None, ""
+        try:
+            with open(config_path) as f:
+                config = json.load(f)
+            request_id, api = config.get("request_id", ""), config.get("api", "")
+        except Exception:
+            request_id, api = "", ""
+        if isinstance(request_id, str) and re.match(r"^[a-zA-Z0-9_-]{1,64}$", request_id):
+            OUTPUT_DIR = os.path.join("Requests", request_id)
+            os.makedirs(OUTPUT_DIR, exist_ok=True)
+            REQUEST_STATUS = STATUS(request_id, OUTPUT_DIR)
+            REQUEST_STATUS.api = api
+        self.__error(code)
+        if REQUEST_STATUS is not None:
+            REQUEST_STATUS.publish()
+
+    def serve(
+            self, spool: str, interval=0.5, memory_limit=1 << 30, profile=False, capacities=None, replica_staleness=None,
+            pipeline_depth=0
+    ):
+        """
+        Runs as a long-running worker that handles the config files dropped into a spool directory.
+
+        Each request is claimed by renaming it, so several workers can serve the same spool directory,
+        and is then handled exactly like a single run of `api`. The question bank of each subject is loaded
+        on its first request, stays loaded between requests while it fits in the memory limit,
+        and is swapped for a new one in the background whenever its 'Data.csv' changes.
+
+        Pending requests wait in bounded lanes, see `ADMISSION`: user management is served before
+        exam generation, and the requests over the capacity of their lane are rejected with OVL.
+        With a replica staleness, exam generation reads users from an in-memory copy, see `REPLICA`.
+        With a pipeline depth, the exams of requests with an id are written by a background output stage
+        while the next requests are handled, see `PIPELINE`.
+
+        Args:
+            spool (str): The directory to take config files ('*.json') from, in name order.
+            interval (float, optional): Seconds to wait when the spool directory is empty. Defaults to 0.5.
+            memory_limit (int, optional): Bytes the loaded question banks may take together. Defaults to 1 GiB.
+            profile (bool, optional): Profile every request, see `profile`. Defaults to False.
+            capacities (dict[str, int], optional): The capacity of every lane.
+                Defaults to 64 pending user management and 32 pending exam generation requests.
+            replica_staleness (float, optional): The oldest in-memory copy of the user database in seconds
+                exam generation reads users from. Defaults to None, reading the database files.
+            pipeline_depth (int, optional): The most exams waiting to be written by the output stage.
+                Defaults to 0, writing every exam before the next request is taken.
+
+        On SIGTERM or SIGINT the worker finishes the request it is handling and the exams queued for output,
+        then returns.
+
+        Returns:
+            bool: False if the question bank could not be loaded, True once stopped.
+        """
+        global bank_registry
+        bank_registry = BANK_REGISTRY(self.__build_warm_bank, memory_limit)
+        if os.path.exists(BANK_REGISTRY.source("")) and bank_registry.snapshot("") is False:
+            log.critical("Failed to load the question bank")
+            return False
+
+        if pipeline_depth:
+            self.pipeline = PIPELINE(self.__create_excel, pipeline_depth)
+            self.__output_sql = SQL(database_name=sql.db_name)
+        stopping = threading.Event()
+        for signal_number in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signal_number, lambda signum, frame: stopping.set())
+        admission = ADMISSION(capacities or {"users": 64, "generation": 32})
+        if replica_staleness:
+            replica = REPLICA(sql.shard_paths(), replica_staleness)
+            if replica.start():
+                sql.replica = admission.replica = replica
+        os.makedirs(spool, exist_ok=True)
+        log.info(f"Serving requests from {spool}")
+        while not stopping.is_set():
+            requests = sorted(name for name in os.listdir(spool) if name.endswith(".json"))
+            lanes = admission.sort(spool, requests)
+
+            # Reject the newest requests of every lane over its capacity, every worker sees the same ones
+            for lane, names in lanes.items():
+                for name in names[admission.capacities[lane]:]:
+                    claimed = os.path.join(spool, f"{name}.working")
+                    try:
+                        os.rename(os.path.join(spool, name), claimed)
+                    except OSError:
+                        continue
+                    log.warning(f"Rejecting {name}, the {lane} lane is full")
+                    self.__reject(claimed, "OVL")
+                    admission.rejected[lane] += 1
+                    os.remove(claimed)
+            admission.rate_limited = self.rate_limited
+            admission.publish()
+
+            # Take the oldest request of the first lane that has one
+            name = next((names[0] for names in lanes.values() if names), None)
+            if name is None:
+                time.sleep(interval)
+                continue
+
+            # Claim the request, another worker may have claimed it first
+            claimed = os.path.join(spool, f"{name}.working")
+            try:
+                os.rename(os.path.join(spool, name), claimed)
+            except OSError:
+                continue
+            admission.admitted[admission.lane(os.path.join(spool, name))] += 1
+
+            try:
+                if profile:
+                    self.profile(claimed)
+                else:
+                    self.api(claimed)
+            except SystemExit:
+                # An unreadable config ends a single run, but must not end the worker
+                pass
+            os.remove(claimed)
+
+        # The claimed configs are gone, so the queued exams must be written before the worker ends
+        if self.pipeline is not None:
+            log.info("Writing the queued exams before stopping")
+            self.pipeline.drain()
+        log.info(f"Stopped serving requests from {spool}")
+        return True
+
+    @staticmethod
+    def submit(config_path: str, queue_path="Jobs.db", priority=0) -> int | bool:
+        """
+        Validates a config file and queues it as a job for the `work` workers.
+
+        Args:
+            config_path (str): The path of the config file.
+            queue_path (str, optional): The path of the job queue. Defaults to "Jobs.db".
+            priority (int, optional): Jobs with a higher priority are handled first. Defaults to 0.
+
+        Returns:
+            int: The id of the job.
+            bool: False if the config file is invalid.
+        """
+        if DATABASE.__read_config(config_path) is False:
+            return False
+        with open(config_path) as f:
+            config = json.load(f)
+        job_id = JOBS(queue_path).submit(config, priority)
+        log.info(f"Queued {config_path} as job {job_id}")
+        return job_id
+
+    def work(
+            self, queue_path="Jobs.db", lease=30.0, interval=0.5, memory_limit=1 << 30, profile=False,
+            replica_staleness=None
+    ):
+        """
+        Runs as a long-running worker that handles the jobs of a shared job queue, see `JOBS`.
+
+        Each job is claimed with a lease that a background thread renews while the job runs,
+        and is then handled exactly like a single run of `api`, in its own request directory.
+        Its result code and status manifest are recorded in the queue.
+        Any amount of workers, on any host sharing the queue file, can work on the same queue.
+
+        Args:
+            queue_path (str, optional): The path of the job queue. Defaults to "Jobs.db".
+            lease (float, optional): Seconds a job is held without a renewal. Defaults to 30.0.
+            interval (float, optional): Seconds to wait when the queue is empty. Defaults to 0.5.
+            memory_limit (int, optional): Bytes the loaded question banks may take together. Defaults to 1 GiB.
+            profile (bool, optional): Profile every job, see `profile`. Defaults to False.
+            replica_staleness (float, optional): The oldest in-memory copy of the user database in seconds
+                exam generation reads users from. Defaults to None, reading the database files.
+
+        Returns:
+            bool: False if the question bank could not be loaded, otherwise it never returns.
+        """
+        global bank_registry
+        bank_registry = BANK_REGISTRY(self.__build_warm_bank, memory_limit)
+        if os.path.exists(BANK_REGISTRY.source("")) and bank_registry.snapshot("") is False:
+            log.critical("Failed to load the question bank")
+            return False
+        if replica_staleness:
+            replica = REPLICA(sql.shard_paths(), replica_staleness)
+            if replica.start():
+                sql.replica = replica
+
+        jobs = JOBS(queue_path)
+        worker = f"{socket.gethostname()}-{os.getpid()}"
+        os.makedirs("Jobs", exist_ok=True)
+        log.info(f"Working on the jobs of {queue_path} as {worker}")
+        while True:
+            job = jobs.claim(worker, lease)
+            if job is None:
+                time.sleep(interval)
+                continue
+            job_id, config = job
+
+            # Every job writes into its own request directory, named after the job unless it has an id
+            if not config.get("request_id"):
+                config["request_id"] = f"job-{job_id}"
+            config_path = os.path.join("Jobs", f"job-{job_id}.json")
+            with open(config_path, "w") as f:
+                json.dump(config, f)
+
+            # Renew the lease while the job runs, so other workers only take it back if this one stops
+            finished = threading.Event()
+
+            def renew():
+                while not finished.wait(lease / 3):
+                    if not jobs.renew(job_id, worker, lease):
+                        log.warning(f"Lost the lease of job {job_id}")
+                        return
+
+            threading.Thread(target=renew, name=f"lease-{job_id}", daemon=True).start()
+            try:
+                if profile:
+                    self.profile(config_path)
+                else:
+                    self.api(config_path)
+            except SystemExit:
+                # An unreadable config ends a single run, but must not end the worker
+                pass
+            finally:
+                finished.set()
+
+            # Record the status manifest of the request as the result of the job
+            try:
+                if not re.match(r"^[a-zA-Z0-9_-]{1,64}$", str(config["request_id"])):
+                    raise ValueError(f"Invalid request id: {config['request_id']}")
+                with open(os.path.join("Requests", config["request_id"], "status.json")) as f:
+                    result = json.load(f)
+                code = result["code"]
+            except Exception:
+                result, code = None, "CCD"
+            if not jobs.finish(job_id, worker, code, result):
+                log.warning(f"Job {job_id} was taken back before it finished, its result was not recorded")
+            os.remove(config_path)
+
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exam Generator Server")
+    parser.add_argument(
+        "--build-blocklist",
+        nargs=2,
+        metavar=("SOURCE", "DESTINATION"),
+        help="Build a blocklist file from a plain-text list of passwords and exit",
+    )
+    parser.add_argument(
+        "--publish-bank",
+        nargs="?",
+        const="",
+        metavar="SUBJECT",
+        help="Validate the Data.csv of SUBJECT (default: the working directory), publish it as the shared question bank and exit",
+    )
+    parser.add_argument(
+        "--import-bank",
+        nargs="?",
+        const="",
+        metavar="SUBJECT",
+        help="Validate the Data.csv of SUBJECT (default: the working directory), import it into Questions.db for the 'sqlite' question source and exit",
+    )
+    parser.add_argument(
+        "--reshard",
+        type=int,
+        metavar="N",
+        help="Move the users into N database files (1 to keep them in Users.db) and exit, no requests may run meanwhile",
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="SPOOL",
+        help="Keep running and handle every config file dropped into the SPOOL directory",
+    )
+    parser.add_argument(
+        "--work",
+        action="store_true",
+        help="Keep running and handle the jobs of the --jobs queue, any amount of workers may share it",
+    )
+    parser.add_argument(
+        "--submit",
+        metavar="CONFIG",
+        help="Validate the CONFIG file, queue it as a job in the --jobs queue, print its id and exit",
+    )
+    parser.add_argument(
+        "--jobs",
+        default="Jobs.db",
+        metavar="PATH",
+        help="The job queue of --work and --submit (default: Jobs.db)",
+    )
+    parser.add_argument(
+        "--priority",
+        type=int,
+        default=0,
+        help="With --submit, jobs with a higher priority are handled first (default: 0)",
+    )
+    parser.add_argument(
+        "--lease",
+        type=float,
+        default=30.0,
+        metavar="SECONDS",
+        help="With --work, seconds until the job of a worker that stopped is handled by another one (default: 30)",
+    )
+    parser.add_argument(
+        "--bank-memory",
+        type=int,
+        default=1024,
+        metavar="MB",
+        help="With --serve or --work, the memory the question banks of all subjects may take before the least recently used are unloaded (default: 1024)",
+    )
+    parser.add_argument(
+        "--user-queue",
+        type=int,
+        default=64,
+        metavar="N",
+        help="With --serve, the most pending user management requests before new ones are rejected (default: 64)",
+    )
+    parser.add_argument(
+        "--generation-queue",
+        type=int,
+        default=32,
+        metavar="N",
+        help="With --serve, the most pending exam generation requests before new ones are rejected (default: 32)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        type=int,
+        default=0,
+        metavar="N",
+        help="With --serve, write the exams of up to N requests with an id in the background while the next requests are handled (default: 0, off)",
+    )
+    parser.add_argument(
+        "--read-replica",
+        type=float,
+        metavar="SECONDS",
+        help="With --serve or --work, read the users of exam generations from an in-memory copy of the user database at most SECONDS old",
+    )
+    parser.add_argument(
+        "--rec-burst",
+        type=int,
+        default=DATABASE.REC_BURST,
+        metavar="N",
+        help=f"The most exams a user can generate at once (default: {DATABASE.REC_BURST})",
+    )
+    parser.add_argument(
+        "--rec-per-minute",
+        type=float,
+        default=DATABASE.REC_PER_MINUTE,
+        metavar="N",
+        help=f"The exams a user can generate every minute after a burst, 0 for no limit (default: {DATABASE.REC_PER_MINUTE})",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the request (or with --serve or --work, every request) and write a report next to the log file",
+    )
+    parser.add_argument(
+        "--config",
+        default="config.json",
+        help="The config file of the request to handle (default: config.json)",
+    )
+    args = parser.parse_args()
+
     db_name = "Users.db"
-    sql = SQL(database_name=db_name)
     log = LOG(filename="DataBase.log")
-    DATABASE().api()
+    if args.build_blocklist:
+        exit(0 if BLOCKLIST.build(*args.build_blocklist) else 1)
+
+    if args.publish_bank is not None:
+        exit(0 if DATABASE.publish_bank(args.publish_bank) else 1)
+    if args.import_bank is not None:
+        exit(0 if DATABASE.import_bank(args.import_bank) else 1)
+    if args.submit:
+        job_id = DATABASE.submit(args.submit, args.jobs, args.priority)
+        if job_id is False:
+            exit(1)
+        print(job_id)
+        exit(0)
+
+    sql = SQL(database_name=db_name)
+    if args.reshard is not None:
+        exit(0 if sql.reshard(args.reshard) else 1)
+    blocklist = BLOCKLIST("Blocklist.bin")
+    bank_registry = None
+    DATABASE.REC_BURST, DATABASE.REC_PER_MINUTE = args.rec_burst, args.rec_per_minute
+    if args.serve:
+        DATABASE().serve(
+            args.serve,
+            memory_limit=args.bank_memory << 20,
+            profile=args.profile,
+            capacities={"users": args.user_queue, "generation": args.generation_queue},
+            replica_staleness=args.read_replica,
+            pipeline_depth=args.pipeline,
+        )
+    elif args.work:
+        DATABASE().work(
+            args.jobs,
+            lease=args.lease,
+            memory_limit=args.bank_memory << 20,
+            profile=args.profile,
+            replica_staleness=args.read_replica,
+        )
+    elif args.profile:
+        DATABASE().profile(args.config)
+    else:
+        DATABASE().api(args.config)
@@ -0,0 +1,455 @@
+"""
+A load generator for the Exam Generator Server.
+
+It replays a mix of REC, RUC, RDU and RUR requests against a temporary workspace holding a copy of
+`DataBase.py`, a synthetic `Data.csv` and a pre-filled `Users.db`, the same way the front end does:
+every request is a config file handled by its own `DataBase.py` process, or with `--workers`, by long-running
+workers serving a spool directory, or with `--queue` as well, by workers sharing a job queue. It reports throughput, latency percentiles, error codes and SQLite lock errors,
+and can compare the results to a baseline to catch regressions.
+
+Example:
+    python LoadTest.py --requests 200 --concurrency 8 --rate 10 --mix REC=70,RUC=20,RDU=5,RUR=5
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import DataBase
+
+
+class LOAD_TEST:
+    # The exam every REC request asks for, always possible with the synthetic scores of 1 to 3
+    EXAM = {
+        "hard_data_to_use": 2,
+        "medium_data_to_use": 1,
+        "easy_data_to_use": 3,
+        "minimum_titles": 3,
+        "total_points": 12,
+    }
+    APIS = ("REC", "RUC", "RDU", "RUR")
+
+    # Seconds to wait for the status manifest of a request served by the workers
+    TIMEOUT = 300
+
+    def __init__(
+            self, workspace: str, questions=10000, titles=20, users=50, workers=0, seed=None, queue=False, pipeline=0
+    ):
+        """
+        Initializes the load test.
+
+        Args:
+            workspace (str): The directory to run the requests in, created if it does not exist.
+            questions (int, optional): The amount of questions of the synthetic Data.csv. Defaults to 10000.
+            titles (int, optional): The amount of distinct titles of the synthetic Data.csv. Defaults to 20.
+            users (int, optional): The amount of users created before the run. Defaults to 50.
+            workers (int, optional): The amount of `--serve` workers, 0 to start a process per request. Defaults to 0.
+            seed (int, optional): The seed of the request mix and of the synthetic data. Defaults to None.
+            queue (bool, optional): Send the requests to the workers through a job queue instead. Defaults to False.
+            pipeline (int, optional): The `--pipeline` depth of the `--serve` workers, 0 for none. Defaults to 0.
+        """
+        self.workspace = os.path.abspath(workspace)
+        self.questions = questions
+        self.titles = titles
+        self.users = users
+        self.workers = workers
+        self.queue = queue
+        self.pipeline = pipeline
+        self.random = random.Random(seed)
+        self.results = []
+        self.__lock = threading.Lock()
+        self.__processes = []
+
+    @staticmethod
+    def username(number: int) -> str:
+        """
+        Returns a unique username for a number, usernames may only hold letters.
+        """
+        letters = ""
+        while True:
+            number, digit = divmod(number, 26)
+            letters += string.ascii_lowercase[digit]
+            if not number:
+                break
+        return f"Load {letters}"
+
+    @staticmethod
+    def password(number: int) -> str:
+        """
+        Returns a unique password for a number.
+        """
+        return f"LoadPass{number:07d}"
+
+    def prepare(self, plan: list[str]):
+        """
+        Creates the workspace: a copy of DataBase.py, a synthetic Data.csv and the users the plan needs.
+
+        Users 0 to `users` - 1 are used by REC and RDU, the next ones are removed by the RUR requests,
+        and the RUC requests create the users after them.
+
+        Args:
+            plan (list[str]): The API code of every request of the run.
+        """
+        os.makedirs(self.workspace, exist_ok=True)
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "DataBase.py"), self.workspace)
+
+        with open(os.path.join(self.workspace, "Data.csv"), "w", encoding="utf-8") as file:
+            file.write("Questions,Question Type,Difficulty (Easy, Medium, Hard),Score,URL\n")
+            for i in range(self.questions):
+                file.write(
+                    f"Load question {i},t{self.random.randint(1, self.titles)},"
+                    f"{self.random.choice(('Hard', 'Medium', 'Easy'))},{self.random.randint(1, 3)},"
+                    f"https://example.com/{i}\n"
+                )
+
+        # Create the users directly, going through RUC would take a process per user
+        DataBase.log = DataBase.LOG(filename=os.path.join(self.workspace, "DataBase.log"), use_colorlog=False)
+        sql = DataBase.sql = DataBase.SQL(database_name=os.path.join(self.workspace, "Users.db"))
+        for number in range(self.users + plan.count("RUR")):
+            sql.add_db(self.username(number), ["Title1", "Title2"], self.password(number))
+
+    def start_workers(self):
+        """
+        Starts the `--serve` or `--work` workers, if any, and waits for them to load the question bank.
+        """
+        if self.queue:
+            command = ["--work"]
+        else:
+            command = ["--serve", "Spool"] + (["--pipeline", str(self.pipeline)] if self.pipeline else [])
+        for _ in range(self.workers):
+            self.__processes.append(
+                subprocess.Popen(
+                    [sys.executable, "DataBase.py"] + command,
+                    cwd=self.workspace,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            )
+
+        # A warm-up request tells when the workers serve requests
+        if self.workers:
+            self.run_request(-1, "REC", self.config(-1, "REC", {}))
+
+    def stop_workers(self):
+        """
+        Stops the workers.
+        """
+        for process in self.__processes:
+            process.terminate()
+        for process in self.__processes:
+            process.wait()
+
+    def config(self, number: int, api: str, counters: dict[str, int]) -> dict:
+        """
+        Builds the config of a request.
+
+        Args:
+            number (int): The number of the request, -1 for the warm-up request.
+            api (str): The API code of the request.
+            counters (dict[str, int]): The amount of RUC and RUR requests planned so far.
+
+        Returns:
+            dict: The config.
+        """
+        config = dict(self.EXAM)
+        config.update(
+            {
+                "use_debug_(ONLY_IF_YOU_DEVELOPED_THIS!)": False,
+                "api": api,
+                "exclusion_titles": ["", ""],
+                "request_id": f"load_{number}" if number >= 0 else "load_warmup",
+            }
+        )
+        if api == "RUC":
+            user = self.users + counters["RUR_TOTAL"] + counters["RUC"]
+        elif api == "RUR":
+            user = self.users + counters["RUR"]
+        else:
+            user = self.random.randrange(self.users)
+        if api == "RDU":
+            config["exclusion_titles"] = [f"t{self.random.randint(1, self.titles)}"]
+        config["username"] = self.username(user)
+        config["password"] = self.password(user)
+        return config
+
+    def run_request(self, number: int, api: str, config: dict) -> dict:
+        """
+        Sends a request through the file protocol and waits for its status manifest.
+
+        Args:
+            number (int): The number of the request.
+            api (str): The API code of the request.
+            config (dict): The config of the request.
+
+        Returns:
+            dict: The result of the request.
+        """
+        status_path = os.path.join(self.workspace, "Requests", config["request_id"], "status.json")
+        started = time.perf_counter()
+        if self.workers and self.queue:
+            DataBase.JOBS(os.path.join(self.workspace, "Jobs.db")).submit(config)
+            while not os.path.exists(status_path) and time.perf_counter() - started < self.TIMEOUT:
+                time.sleep(0.005)
+        elif self.workers:
+            # Write under another name first, workers only take complete '*.json' files
+            spool = os.path.join(self.workspace, "Spool")
+            os.makedirs(spool, exist_ok=True)
+            path = os.path.join(spool, f"{config['request_id']}.json")
+            with open(f"{path}.tmp", "w") as file:
+                json.dump(config, file)
+            os.replace(f"{path}.tmp", path)
+            while not os.path.exists(status_path) and time.perf_counter() - started < self.TIMEOUT:
+                time.sleep(0.005)
+        else:
+            path = os.path.join(self.workspace, "Configs", f"{config['request_id']}.json")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                json.dump(config, file)
+            subprocess.run(
+                [sys.executable, "DataBase.py", "--config", path],
+                cwd=self.workspace,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        finished = time.perf_counter()
+
+        try:
+            with open(status_path) as file:
+                status = json.load(file)
+        except (OSError, ValueError):
+            status = {"code": "NO_STATUS", "timings_ms": {}}
+        return {
+            "number": number,
+            "api": api,
+            "code": status["code"],
+            "started": started,
+            "finished": finished,
+            "timings_ms": status.get("timings_ms", {}),
+        }
+
+    def run(self, plan: list[str], concurrency: int, rate: float) -> float:
+        """
+        Runs the requests of the plan.
+
+        With a rate, requests are started on schedule no matter how long earlier ones take (an open loop),
+        and their latency counts from their scheduled start, so queueing shows up in the percentiles.
+        Without one, `concurrency` requests are always running (a closed loop).
+
+        Args:
+            plan (list[str]): The API code of every request.
+            concurrency (int): The most requests running at once.
+            rate (float): Requests started per second, 0 for as fast as possible.
+
+        Returns:
+            float: The duration of the run in seconds.
+        """
+        counters = {"RUC": 0, "RUR": 0, "RUR_TOTAL": plan.count("RUR")}
+        configs = []
+        for api in plan:
+            configs.append(self.config(len(configs), api, counters))
+            if api in counters:
+                counters[api] += 1
+
+        def request(number, scheduled):
+            result = self.run_request(number, plan[number], configs[number])
+            result["scheduled"] = scheduled if scheduled is not None else result["started"]
+            with self.__lock:
+                self.results.append(result)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for number in range(len(plan)):
+                scheduled = None
+                if rate:
+                    scheduled = started + number / rate
+                    time.sleep(max(0.0, scheduled - time.perf_counter()))
+                executor.submit(request, number, scheduled)
+        return time.perf_counter() - started
+
+    def lock_errors(self) -> int:
+        """
+        Returns the amount of SQLite lock errors logged during the run.
+        """
+        try:
+            with open(os.path.join(self.workspace, "DataBase.log"), encoding="utf-8", errors="replace") as file:
+                return sum(1 for line in file if "database is locked" in line)
+        except OSError:
+            return 0
+
+    def report(self, duration: float) -> dict:
+        """
+        Summarizes the results of the run.
+
+        Args:
+            duration (float): The duration of the run in seconds.
+
+        Returns:
+            dict: The throughput, and per API the amount of requests, latency percentiles,
+            error codes and mean stage timings.
+        """
+
+        def percentile(values, fraction):
+            return values[min(len(values) - 1, int(fraction * len(values)))] if values else None
+
+        report = {
+            "requests": len(self.results),
+            "duration_s": round(duration, 3),
+            "throughput_rps": round(len(self.results) / duration, 3) if duration else None,
+            "lock_errors": self.lock_errors(),
+            "apis": {},
+        }
+        for api in self.APIS:
+            results = [result for result in self.results if result["api"] == api]
+            if not results:
+                continue
+            latencies = sorted((result["finished"] - result["scheduled"]) * 1000 for result in results)
+            codes = {}
+            stages = {}
+            for result in results:
+                codes[result["code"]] = codes.get(result["code"], 0) + 1
+                for stage, milliseconds in result["timings_ms"].items():
+                    stages.setdefault(stage, []).append(milliseconds)
+            report["apis"][api] = {
+                "requests": len(results),
+                "codes": codes,
+                "latency_ms": {
+                    "p50": round(percentile(latencies, 0.50), 1),
+                    "p90": round(percentile(latencies, 0.90), 1),
+                    "p99": round(percentile(latencies, 0.99), 1),
+                    "max": round(latencies[-1], 1),
+                },
+                "stage_mean_ms": {stage: round(sum(values) / len(values), 2) for stage, values in stages.items()},
+            }
+        return report
+
+    @staticmethod
+    def print_report(report: dict):
+        """
+        Prints a report as a table.
+        """
+        print(
+            f"{report['requests']} requests in {report['duration_s']} s, "
+            f"{report['throughput_rps']} requests/s, {report['lock_errors']} SQLite lock errors"
+        )
+        print(f"{'API':<5}{'count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}  codes")
+        for api, summary in report["apis"].items():
+            latency = summary["latency_ms"]
+            codes = ", ".join(f"{code}: {count}" for code, count in sorted(summary["codes"].items()))
+            print(
+                f"{api:<5}{summary['requests']:>7}{latency['p50']:>10}{latency['p90']:>10}"
+                f"{latency['p99']:>10}{latency['max']:>10}  {codes}"
+            )
+        for api, summary in report["apis"].items():
+            stages = ", ".join(f"{stage} {milliseconds}" for stage, milliseconds in summary["stage_mean_ms"].items())
+            print(f"{api} mean stage ms: {stages}")
+
+    @staticmethod
+    def regressions(report: dict, baseline: dict, tolerance: float) -> list[str]:
+        """
+        Compares a report to a baseline report.
+
+        Args:
+            report (dict): The report of this run.
+            baseline (dict): The report of an earlier run with the same options.
+            tolerance (float): The allowed relative slowdown, for example 0.2 for 20%.
+
+        Returns:
+            list[str]: A description of every regression found.
+        """
+        found = []
+        if report["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+            found.append(f"throughput {report['throughput_rps']} < baseline {baseline['throughput_rps']} requests/s")
+        for api, summary in report["apis"].items():
+            if api not in baseline["apis"]:
+                continue
+            for key in ("p50", "p90"):
+                now, before = summary["latency_ms"][key], baseline["apis"][api]["latency_ms"][key]
+                if now > before * (1 + tolerance):
+                    found.append(f"{api} {key} latency {now} > baseline {before} ms")
+        return found
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """
+    Parses a request mix like "REC=70,RUC=20,RDU=5,RUR=5" into weights per API code.
+    """
+    weights = {}
+    for part in mix.split(","):
+        api, weight = part.split("=")
+        if api.strip() not in LOAD_TEST.APIS:
+            raise argparse.ArgumentTypeError(f"Unknown API code in the mix: {api}")
+        weights[api.strip()] = float(weight)
+    return weights
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the Exam Generator Server")
+    parser.add_argument("--requests", type=int, default=100, help="Amount of requests to send (default: 100)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Most requests running at once (default: 4)")
+    parser.add_argument(
+        "--rate", type=float, default=0, help="Requests started per second, 0 for as fast as possible (default: 0)"
+    )
+    parser.add_argument(
+        "--mix", type=parse_mix, default="REC=70,RUC=20,RDU=5,RUR=5",
+        help="Weights of the API codes (default: REC=70,RUC=20,RDU=5,RUR=5)",
+    )
+    parser.add_argument("--questions", type=int, default=10000, help="Rows of the synthetic Data.csv (default: 10000)")
+    parser.add_argument("--titles", type=int, default=20, help="Titles of the synthetic Data.csv (default: 20)")
+    parser.add_argument("--users", type=int, default=50, help="Users created before the run (default: 50)")
+    parser.add_argument(
+        "--workers", type=int, default=0,
+        help="Serve the requests with this many --serve workers instead of a process per request (default: 0)",
+    )
+    parser.add_argument(
+        "--queue", action="store_true",
+        help="With --workers, send the requests through a --work job queue instead of a spool directory",
+    )
+    parser.add_argument(
+        "--pipeline", type=int, default=0,
+        help="With --workers, the --pipeline depth of the --serve workers (default: 0, off)",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the request mix and of the synthetic data")
+    parser.add_argument("--workspace", help="Directory to run in (default: a temporary directory, removed afterwards)")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    parser.add_argument("--baseline", help="Compare to the report of an earlier run, exit with 1 on regressions")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed relative slowdown against the baseline (default: 0.2)"
+    )
+    args = parser.parse_args()
+
+    workspace = args.workspace or tempfile.mkdtemp(prefix="exam-load-")
+    test = LOAD_TEST(
+        workspace, args.questions, args.titles, args.users, args.workers, args.seed, args.queue, args.pipeline
+    )
+    plan = test.random.choices(list(args.mix), weights=list(args.mix.values()), k=args.requests)
+    print(f"Preparing the workspace {workspace}...")
+    test.prepare(plan)
+    try:
+        test.start_workers()
+        duration = test.run(plan, args.concurrency, args.rate)
+    finally:
+        test.stop_workers()
+
+    result = test.report(duration)
+    LOAD_TEST.print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=4)
+    if not args.workspace:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = LOAD_TEST.regressions(result, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        exit(1 if problems else 0)